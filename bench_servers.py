@@ -0,0 +1,260 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# Local stand-ins for OpenWeather and speedtest.net, so benchmark.py can
+# run the real client code offline and get repeatable numbers.
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real servers
+    # Headers and body are separate writes, without this delayed ACKs add
+    # ~40 ms to every keep-alive reply
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type="application/json", status=200, rate_mbps=None):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not rate_mbps:
+            self.wfile.write(body)
+            return
+        # Paced in 64 KB chunks to look like a slower link
+        started = time.perf_counter()
+        for offset in range(0, len(body), 65536):
+            self.wfile.write(body[offset:offset + 65536])
+            due = started + (offset + 65536) * 8 / (rate_mbps * 1_000_000)
+            time.sleep(max(0.0, due - time.perf_counter()))
+
+    def route(self):
+        # Proxied requests carry the full URL, direct ones only the path
+        url = urlparse(self.path)
+        return url.path, {key: values[0] for key, values in parse_qs(url.query).items()}
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-transfer (e.g. a speed test stopping early) is normal
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandInServer:
+    """Threaded HTTP server on 127.0.0.1 with a random free port.
+
+    Use as a context manager, the server runs on a daemon thread until
+    the block exits.
+    """
+
+    handler_class = _Handler
+
+    def __init__(self):
+        self.requests = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stand_in = self
+
+        class Handler(self.handler_class):
+            server_state = stand_in
+
+        self._server = _Server(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+################OPENWEATHER################
+
+def current_weather_json(name, city_id=0):
+    return {
+        "id": city_id,
+        "name": name,
+        "main": {"temp": 12.5, "humidity": 71},
+        "weather": [{"description": "scattered clouds"}],
+        "wind": {"speed": 4.1},
+    }
+
+
+def forecast_json(name, steps=40, start=1_700_000_000):
+    """A /forecast reply with `steps` 3-hour entries"""
+    entries = []
+    for i in range(steps):
+        entry = {
+            "dt": start + i * 10800,
+            "main": {"temp": 8 + (i % 8), "humidity": 60 + (i % 20)},
+            "wind": {"speed": 2 + (i % 5)},
+            "weather": [{"description": "light rain" if i % 3 == 0 else "overcast clouds"}],
+        }
+        if i % 3 == 0:
+            entry["rain"] = {"3h": 0.4}
+        entries.append(entry)
+    return {"list": entries, "city": {"name": name, "timezone": 3600}}
+
+
+class _OpenWeatherHandler(_Handler):
+    def do_GET(self):
+        self.server_state.requests += 1
+        path, query = self.route()
+        name = query.get("q", "Stand-in City")
+        if self.server_state.delay:
+            time.sleep(self.server_state.delay)
+        if path.endswith("/weather"):
+            self.send_body(json.dumps(current_weather_json(name)))
+        elif path.endswith("/group"):
+            ids = [int(i) for i in query.get("id", "").split(",") if i]
+            reply = {"cnt": len(ids),
+                     "list": [current_weather_json(f"City {i}", i) for i in ids]}
+            self.send_body(json.dumps(reply))
+        elif path.endswith("/forecast"):
+            self.send_body(json.dumps(forecast_json(name)))
+        else:
+            self.send_body(json.dumps({"cod": 404, "message": "not found"}), status=404)
+
+
+class OpenWeatherStandIn(StandInServer):
+    """Answers /weather, /group and /forecast with fixed data.
+
+    delay adds server-side latency (seconds) to every reply.
+    """
+
+    handler_class = _OpenWeatherHandler
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+
+    def urls(self):
+        """The module-level URLs weather.py / forecast.py should point at"""
+        base = f"{self.url}/data/2.5"
+        return {"weather": f"{base}/weather", "group": f"{base}/group",
+                "forecast": f"{base}/forecast"}
+
+
+################SPEEDTEST.NET################
+
+SPEEDTEST_CONFIG = """<?xml version="1.0" encoding="UTF-8"?>
+<settings>
+<client ip="127.0.0.1" lat="51.5" lon="-0.1" isp="Stand-in" isprating="3.7" rating="0" ispdlavg="0" ispulavg="0" loggedin="0" country="GB"/>
+<server-config threadcount="{threads}" ignoreids="" notonmap="" forcepingid="" preferredserverid=""/>
+<download testlength="{test_length}" initialtest="250K" mintestsize="250K" threadsperurl="{per_url}"/>
+<upload testlength="{test_length}" ratio="{upload_ratio}" initialtest="0" mintestsize="32K" threads="{threads}" maxchunksize="512K" maxchunkcount="{upload_chunks}" threadsperurl="4"/>
+</settings>
+"""
+
+SPEEDTEST_SERVER = ('<server url="{url}/speedtest/upload.php" lat="51.5" lon="-0.1" '
+                    'name="Localhost" country="United Kingdom" cc="GB" '
+                    'sponsor="Stand-in" id="{id}" host="{host}"/>')
+
+
+class _SpeedtestHandler(_Handler):
+    def do_GET(self):
+        state = self.server_state
+        state.requests += 1
+        path, _ = self.route()
+        name = os.path.basename(path)
+        if name == "speedtest-config.php":
+            self.send_body(state.config_xml(), "text/xml")
+        elif name.startswith("speedtest-servers"):
+            self.send_body(state.servers_xml(), "text/xml")
+        elif name == "latency.txt":
+            if state.latency:
+                time.sleep(state.latency)
+            self.send_body("test=test", "text/plain")
+        elif name.startswith("random") and name.endswith(".jpg"):
+            # random350x350.jpg ... random4000x4000.jpg, scaled down to keep runs short
+            size = int(name[len("random"):].split("x")[0])
+            self.send_body(state.payload(size * state.download_scale), "image/jpeg",
+                           rate_mbps=state.rate_mbps)
+        else:
+            self.send_body("not found", "text/plain", status=404)
+
+    def do_POST(self):
+        self.server_state.requests += 1
+        length = int(self.headers.get("Content-Length", 0))
+        remaining = length
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 65536))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        self.send_body(f"size={length - remaining}", "text/plain")
+
+
+class SpeedtestStandIn(StandInServer):
+    """Serves the speedtest.net config, server list, latency, download and
+    upload endpoints that speedtest-cli talks to.
+
+    speedtest-cli fetches its config and server list from fixed
+    speedtest.net URLs, so point it here with proxy_environ() (plain
+    HTTP, i.e. secure=False). The server entry points straight back at
+    this server for the latency, download and upload requests.
+    """
+
+    handler_class = _SpeedtestHandler
+
+    def __init__(self, download_scale=250, upload_ratio=6, upload_chunks=4,
+                 threads=2, per_url=1, test_length=10, latency=0.0, servers=1, rate_mbps=None):
+        super().__init__()
+        self.rate_mbps = rate_mbps  # per download connection, None for as fast as possible
+        self.servers = servers  # entries in the server list, all pointing here
+        self.download_scale = download_scale  # bytes served per pixel of "randomNxN"
+        self.upload_ratio = upload_ratio      # 6 -> 1 MB and 7 MB uploads
+        self.upload_chunks = upload_chunks
+        self.threads = threads
+        self.per_url = per_url
+        self.test_length = test_length
+        self.latency = latency
+        self._payloads = {}
+
+    def config_xml(self):
+        return SPEEDTEST_CONFIG.format(
+            threads=self.threads, test_length=self.test_length, per_url=self.per_url,
+            upload_ratio=self.upload_ratio, upload_chunks=self.upload_chunks)
+
+    def servers_xml(self):
+        host = self.url[len("http://"):]
+        servers = "".join(SPEEDTEST_SERVER.format(url=self.url, id=i + 1, host=host)
+                          for i in range(self.servers))
+        return f'<?xml version="1.0" encoding="UTF-8"?>\n<settings><servers>{servers}</servers></settings>\n'
+
+    def payload(self, size):
+        # Built once per size, the handler threads only read it
+        if size not in self._payloads:
+            self._payloads[size] = os.urandom(size)
+        return self._payloads[size]
+
+    def proxy_environ(self):
+        """Environment that sends speedtest-cli's plain HTTP requests here"""
+        return {"http_proxy": self.url, "HTTP_PROXY": self.url, "no_proxy": "", "NO_PROXY": ""}
@@ -0,0 +1,354 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import bench_servers
+
+
+# Benchmarks that run offline against the stand-ins in bench_servers.py.
+# Every benchmark is a setup function that takes the running stand-ins and
+# returns a callable (the timed part) plus a dict of extra numbers to
+# report alongside the timings.
+BENCHMARKS = {}
+
+
+def benchmark(name, number=1, repeat=5):
+    """Register a benchmark; the callable it returns is run `number` times
+    per sample and sampled `repeat` times"""
+    def register(setup):
+        BENCHMARKS[name] = (setup, number, repeat)
+        return setup
+    return register
+
+
+def measure(fn, number, repeat):
+    """Per-call times in ms, one per sample (like timeit.repeat)"""
+    samples = []
+    fn()  # warm up: imports, first connections, caches
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "min_ms": round(ordered[0], 4),
+        "median_ms": round(statistics.median(ordered), 4),
+        "mean_ms": round(statistics.fmean(ordered), 4),
+        "max_ms": round(ordered[-1], 4),
+        "stdev_ms": round(statistics.stdev(ordered), 4) if len(ordered) > 1 else 0.0,
+    }
+
+
+################GAUGE PAINTING################
+
+_app = None
+
+
+def _qt_app():
+    # Paint into QImages without needing a display
+    global _app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    import PyQt5.QtWidgets as QtWidgets
+
+    if _app is None:
+        _app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+    return _app
+
+
+def _gauge_and_image():
+    import PyQt5.QtGui as QtGui
+    from speedometer_gauge import SpeedometerGauge
+
+    _qt_app()
+    gauge = SpeedometerGauge(max_value=1000, label="DOWNLOAD")
+    gauge.resize(300, 300)
+    image = QtGui.QImage(300, 300, QtGui.QImage.Format_ARGB32_Premultiplied)
+    return gauge, image
+
+
+@benchmark("gauge_paint_cold", number=20)
+def gauge_paint_cold(servers):
+    """Full repaint with the dial/ticks layer rebuilt every time"""
+    gauge, image = _gauge_and_image()
+
+    def run():
+        gauge._static_cache = None
+        gauge.render(image)
+    return run, {}
+
+
+@benchmark("gauge_paint_needle", number=100)
+def gauge_paint_needle(servers):
+    """Repaint while the needle moves, dial layer comes from the cache"""
+    gauge, image = _gauge_and_image()
+    values = [i * 7.3 % 1000 for i in range(100)]
+    state = {"i": 0}
+
+    def run():
+        state["i"] = (state["i"] + 1) % len(values)
+        gauge.setValue(values[state["i"]])
+        gauge.render(image)
+    return run, {}
+
+
+@benchmark("chart_pan_1m", number=20)
+def chart_pan_1m(servers):
+    """History chart repaint while panning over a million per-minute samples"""
+    import numpy as np
+    import PyQt5.QtGui as QtGui
+    from history_chart import SpeedHistoryChart
+
+    _qt_app()
+    rng = np.random.default_rng(0)
+    count = 1_000_000
+    times = 1_600_000_000 + np.arange(count) * 60.0
+    download = rng.gamma(5, 20, count)
+    chart = SpeedHistoryChart()
+    chart.resize(900, 400)
+    chart.setData(times, download, download / 3, rng.gamma(2, 8, count))
+    image = QtGui.QImage(900, 400, QtGui.QImage.Format_ARGB32_Premultiplied)
+    span = chart.view_end - chart.view_start
+    state = {"i": 0}
+
+    def run():
+        state["i"] += 1
+        # Alternate zoom levels so both cache hits and merges are timed
+        width = span / (1 + state["i"] % 4)
+        start = chart.view_start + span * 0.001
+        chart.setViewRange(start, start + width)
+        chart.render(image)
+    return run, {}
+
+
+################WEATHER################
+
+def _point_weather_at(stand_in):
+    import forecast
+    import weather
+
+    urls = stand_in.urls()
+    weather.BASE_URL = urls["weather"]
+    weather.GROUP_URL = urls["group"]
+    forecast.FORECAST_URL = urls["forecast"]
+    weather.API_KEY = "benchmark"
+    weather.configure_quota(None, None)  # the stand-in has no budget to protect
+    return weather
+
+
+@benchmark("weather_fetch", number=20)
+def weather_fetch(servers):
+    """Current weather request + JSON parse over the pooled session"""
+    weather = _point_weather_at(servers.openweather)
+    return lambda: weather.get_current_weather("London"), {}
+
+
+@benchmark("weather_parse", number=2000)
+def weather_parse(servers):
+    import weather
+
+    data = bench_servers.current_weather_json("London")
+    return lambda: weather._weather_info(data), {}
+
+
+@benchmark("forecast_parse_rollup", number=200)
+def forecast_parse_rollup(servers):
+    """5-day / 3-hour reply into columns plus the daily rollups"""
+    import forecast
+
+    data = bench_servers.forecast_json("London")
+    return lambda: forecast.ForecastSeries.from_response(data).daily(), {}
+
+
+@benchmark("watchlist_refresh_50", number=3)
+def watchlist_refresh(servers):
+    """50 free-text cities fetched concurrently"""
+    weather = _point_weather_at(servers.openweather)
+    cities = [f"City {i}" for i in range(50)]
+    return lambda: list(weather.iter_many(cities)), {}
+
+
+@benchmark("weather_burst_same_city", number=5)
+def weather_burst_same_city(servers):
+    """20 threads asking for the same city at once, coalesced into one request"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    weather = _point_weather_at(servers.openweather)
+    extra = {}
+
+    def run():
+        before = servers.openweather.requests
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            list(pool.map(lambda _: weather.get_current_weather("London"), range(20)))
+        extra["requests_per_burst"] = servers.openweather.requests - before
+    return run, extra
+
+
+@benchmark("cache_hit", number=5000)
+def cache_hit(servers):
+    import weather_cache
+
+    _point_weather_at(servers.openweather)
+    cache = weather_cache.WeatherCache()
+    cache.refresh("London")
+    return lambda: cache.get("London"), {}
+
+
+@benchmark("cache_miss", number=20)
+def cache_miss(servers):
+    """Miss path: lookup, fetch from the stand-in, store"""
+    import weather_cache
+
+    _point_weather_at(servers.openweather)
+    cache = weather_cache.WeatherCache()
+
+    def run():
+        cache.clear()
+        cache.get("London")
+    return run, {}
+
+
+################SPEED TEST################
+
+def _speedtest_pipeline(servers, stand_in=None, **options):
+    import speedtest_logger
+
+    extra = {}
+    stand_in = stand_in or servers.speedtest
+
+    def run():
+        # Only while the test runs, requests (weather) honours these too
+        saved = dict(os.environ)
+        os.environ.update(stand_in.proxy_environ())
+        try:
+            result = speedtest_logger.run_speed_test(secure=False, timeout=10, **options)
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+        if not result.ok:
+            raise RuntimeError(f"speed test failed during {result.failed_phase}: {result.error}")
+        extra.update(download_mbps=round(result.download_mbps, 1),
+                     upload_mbps=round(result.upload_mbps, 1),
+                     bytes_received=result.bytes_received, bytes_sent=result.bytes_sent,
+                     discovery_ms=round(result.timings["discovery"] * 1000, 1))
+        if result.quick:
+            extra.update(stop_reasons=result.stop_reasons, download_ci=result.download_ci)
+    return run, extra
+
+
+@benchmark("speedtest_pipeline", number=1, repeat=3)
+def speedtest_pipeline(servers):
+    """Discovery, download and upload against the local speedtest server"""
+    return _speedtest_pipeline(servers)
+
+
+@benchmark("speedtest_discovery_cached", number=1, repeat=3)
+def speedtest_discovery_cached(servers):
+    """Same, with the best server cached by the warm-up run (in memory only)"""
+    import server_cache
+
+    return _speedtest_pipeline(servers, server_cache=server_cache.ServerCache(path=None))
+
+
+@benchmark("speedtest_quick_throttled", number=1, repeat=3)
+def speedtest_quick_throttled(servers):
+    """Quick mode against a paced server whose full schedule takes ~15 s"""
+    return _speedtest_pipeline(servers, servers.speedtest_throttled, quick=True)
+
+
+################RUNNER################
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=None, scale=1.0):
+    """Run the selected benchmarks and return the report dict"""
+    results = []
+    with bench_servers.OpenWeatherStandIn() as owm, bench_servers.SpeedtestStandIn() as st, \
+            bench_servers.SpeedtestStandIn(download_scale=20000, rate_mbps=50) as throttled:
+        servers = argparse.Namespace(openweather=owm, speedtest=st, speedtest_throttled=throttled)
+        for name, (setup, number, repeat) in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            fn, extra = setup(servers)
+            number = max(1, int(number * scale))
+            samples = measure(fn, number, repeat)
+            entry = {"name": name, "number": number, "repeat": repeat}
+            entry.update(summarize(samples))
+            entry.update(extra)
+            results.append(entry)
+            print(f"{name:24} median {entry['median_ms']:10.4f} ms", file=sys.stderr)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(old, new, threshold=1.2):
+    """Median ratio per benchmark (new / old) and the ones over threshold"""
+    old_by_name = {r["name"]: r for r in old["results"]}
+    rows, regressions = [], []
+    for result in new["results"]:
+        before = old_by_name.get(result["name"])
+        if before is None or not before["median_ms"]:
+            continue
+        ratio = result["median_ms"] / before["median_ms"]
+        rows.append((result["name"], before["median_ms"], result["median_ms"], ratio))
+        if ratio > threshold:
+            regressions.append(result["name"])
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks, results as JSON.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default all): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", metavar="FILE", help="write the JSON report to FILE instead of stdout")
+    parser.add_argument("--compare", metavar="FILE", help="compare against an earlier JSON report")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="with --compare, exit 1 if a median gets slower than this ratio")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, for a smoke run")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks(args.names, scale=0.1 if args.quick else 1.0)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        rows, regressions = compare(old, report, args.threshold)
+        for name, before, after, ratio in rows:
+            flag = "  SLOWER" if name in regressions else ""
+            print(f"{name:24} {before:10.4f} -> {after:10.4f} ms  x{ratio:.2f}{flag}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
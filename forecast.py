@@ -0,0 +1,127 @@
+import datetime
+
+import numpy as np
+import requests
+
+import weather
+
+
+FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+
+
+class ForecastSeries:
+    """5-day / 3-hour forecast stored as columns instead of a dict per step.
+
+    Every field is one numpy array (timestamps int64, readings float32),
+    and the daily rollups are computed with reduceat over day boundaries
+    and memoized, so switching views never reparses the response.
+    """
+
+    COLUMNS = ("temperature", "humidity", "wind_speed", "precipitation")
+
+    def __init__(self, location, timestamps, temperature, humidity, wind_speed,
+                 precipitation, descriptions=(), tz_offset=0):
+        self.location = location
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.temperature = np.asarray(temperature, dtype=np.float32)
+        self.humidity = np.asarray(humidity, dtype=np.float32)
+        self.wind_speed = np.asarray(wind_speed, dtype=np.float32)
+        self.precipitation = np.asarray(precipitation, dtype=np.float32)
+        self.descriptions = list(descriptions)
+        self.tz_offset = tz_offset  # seconds from UTC for the forecast city
+        self._daily = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @classmethod
+    def from_response(cls, data):
+        """Parse the /forecast JSON in one pass into preallocated arrays"""
+        steps = data["list"]
+        count = len(steps)
+        timestamps = np.empty(count, dtype=np.int64)
+        columns = np.empty((4, count), dtype=np.float32)
+        descriptions = []
+        for i, step in enumerate(steps):
+            timestamps[i] = step["dt"]
+            columns[0, i] = step["main"]["temp"]
+            columns[1, i] = step["main"]["humidity"]
+            columns[2, i] = step["wind"]["speed"]
+            # 'rain'/'snow' only appear when there is some, volume for the last 3h
+            columns[3, i] = (step.get("rain", {}).get("3h", 0.0)
+                             + step.get("snow", {}).get("3h", 0.0))
+            descriptions.append(step["weather"][0]["description"])
+        city = data.get("city", {})
+        return cls(city.get("name", ""), timestamps, *columns, descriptions=descriptions,
+                   tz_offset=city.get("timezone", 0))
+
+    def daily(self):
+        """Per local day min/max/mean rollups as a dict of arrays"""
+        if self._daily is None:
+            self._daily = self._rollup()
+        return self._daily
+
+    def _rollup(self):
+        if len(self) == 0:
+            empty = np.empty(0, dtype=np.float32)
+            return {"day": np.empty(0, dtype=np.int64), "temp_min": empty, "temp_max": empty,
+                    "temp_mean": empty, "humidity_mean": empty, "wind_max": empty,
+                    "precipitation": empty}
+
+        # Steps are in time order, so each day is a contiguous slice
+        days = (self.timestamps + self.tz_offset) // 86400
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(days)) + 1))
+        counts = np.diff(np.append(starts, len(days)))
+        return {
+            "day": days[starts] * 86400,
+            "temp_min": np.minimum.reduceat(self.temperature, starts),
+            "temp_max": np.maximum.reduceat(self.temperature, starts),
+            "temp_mean": np.add.reduceat(self.temperature, starts) / counts,
+            "humidity_mean": np.add.reduceat(self.humidity, starts) / counts,
+            "wind_max": np.maximum.reduceat(self.wind_speed, starts),
+            "precipitation": np.add.reduceat(self.precipitation, starts),
+        }
+
+    def daily_rows(self, days=None):
+        """Daily rollups as plain dicts for display, optionally only `days` of them"""
+        daily = self.daily()
+        rows = []
+        for i in range(len(daily["day"]))[:days]:
+            date = datetime.datetime.fromtimestamp(int(daily["day"][i]), datetime.timezone.utc)
+            rows.append({
+                "date": date.strftime("%a %d %b"),
+                "temp_min": float(daily["temp_min"][i]),
+                "temp_max": float(daily["temp_max"][i]),
+                "temp_mean": float(daily["temp_mean"][i]),
+                "humidity_mean": float(daily["humidity_mean"][i]),
+                "wind_max": float(daily["wind_max"][i]),
+                "precipitation": float(daily["precipitation"][i]),
+            })
+        return rows
+
+    def step_rows(self):
+        """Every 3-hour step as plain dicts for display"""
+        rows = []
+        for i in range(len(self)):
+            time = datetime.datetime.fromtimestamp(int(self.timestamps[i]) + self.tz_offset,
+                                                   datetime.timezone.utc)
+            rows.append({
+                "time": time.strftime("%a %H:%M"),
+                "temperature": float(self.temperature[i]),
+                "humidity": float(self.humidity[i]),
+                "wind_speed": float(self.wind_speed[i]),
+                "precipitation": float(self.precipitation[i]),
+                "description": self.descriptions[i] if i < len(self.descriptions) else "",
+            })
+        return rows
+
+
+def get_forecast_series(location, units="metric"):
+    """Fetch and parse the 5-day / 3-hour forecast, or return an error dict"""
+    try:
+        data = weather._get_json(FORECAST_URL, dict(weather.location_params(location), units=units))
+        return ForecastSeries.from_response(data)
+    except (requests.exceptions.RequestException, weather.QuotaExceeded) as e:
+        return {"error": f"Error fetching forecast data: {e}"}
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return {"error": f"Unexpected forecast data: {e}"}
@@ -0,0 +1,192 @@
+import bisect
+import gzip
+import json
+import mmap
+import os
+import struct
+import sys
+import unicodedata
+from dataclasses import dataclass
+
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.gaz")
+
+# File layout (all integers little-endian):
+#   header   MAGIC, record count (u32), offset table position (u64)
+#   records  one UTF-8 line per city, sorted by search key:
+#            key \t name \t country \t admin \t lat \t lon \t openweather id \n
+#   offsets  u32 start of every record, in the same order
+MAGIC = b"MGAZ0001"
+HEADER = struct.Struct("<8sIQ")
+
+
+def search_key(text):
+    """Case and accent insensitive form used for sorting and prefix search"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.replace("\t", " ").split())
+
+
+@dataclass(frozen=True)
+class City:
+    name: str
+    country: str
+    admin: str
+    lat: float
+    lon: float
+    city_id: int
+
+    @property
+    def label(self):
+        """Unambiguous display text, e.g. 'Paris, Texas, US'"""
+        parts = [self.name]
+        if self.admin:
+            parts.append(self.admin)
+        parts.append(self.country)
+        return ", ".join(parts)
+
+    def __str__(self):
+        return self.label
+
+
+class Gazetteer:
+    """Read-only city index backed by a memory-mapped, sorted file.
+
+    Nothing is read until the first lookup, and then only the pages that a
+    binary search touches, so even a few hundred thousand cities cost
+    almost nothing at startup.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._file = None
+        self._map = None
+        self._count = 0
+        self._offsets = None
+
+    @property
+    def available(self):
+        return os.path.exists(self.path)
+
+    def __len__(self):
+        self._open()
+        return self._count
+
+    def _open(self):
+        if self._map is not None:
+            return
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, table_pos = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a gazetteer file")
+        self._count = count
+        # A zero-copy view of the u32 offset table inside the mapping
+        self._offsets = memoryview(self._map)[table_pos:table_pos + 4 * count].cast("I")
+
+    def close(self):
+        if self._map is not None:
+            self._offsets.release()
+            self._map.close()
+            self._file.close()
+            self._map = self._file = self._offsets = None
+
+    def _key_at(self, index):
+        start = self._offsets[index]
+        end = self._map.find(b"\t", start)
+        return self._map[start:end].decode("utf-8")
+
+    def _city_at(self, index):
+        start = self._offsets[index]
+        end = self._map.find(b"\n", start)
+        fields = self._map[start:end].decode("utf-8").split("\t")
+        _, name, country, admin, lat, lon, city_id = fields
+        return City(name, country, admin, float(lat), float(lon), int(city_id))
+
+    def _lower_bound(self, key):
+        return bisect.bisect_left(_KeyView(self), key)
+
+    def complete(self, text, limit=10):
+        """Cities whose name starts with text, in alphabetical order"""
+        prefix = search_key(text)
+        if not prefix or not self.available:
+            return []
+        self._open()
+        matches = []
+        index = self._lower_bound(prefix)
+        while index < self._count and len(matches) < limit:
+            if not self._key_at(index).startswith(prefix):
+                break
+            matches.append(self._city_at(index))
+            index += 1
+        return matches
+
+    def find(self, name):
+        """Every city with exactly this name (to spot ambiguous input)"""
+        key = search_key(name)
+        if not key or not self.available:
+            return []
+        self._open()
+        matches = []
+        index = self._lower_bound(key)
+        while index < self._count and self._key_at(index) == key:
+            matches.append(self._city_at(index))
+            index += 1
+        return matches
+
+
+class _KeyView:
+    """Sequence of search keys so bisect can run straight on the mapping"""
+
+    def __init__(self, gazetteer):
+        self._gazetteer = gazetteer
+
+    def __len__(self):
+        return self._gazetteer._count
+
+    def __getitem__(self, index):
+        return self._gazetteer._key_at(index)
+
+
+def build(cities, path):
+    """Write an iterable of City records to a gazetteer file"""
+    rows = []
+    for city in cities:
+        fields = (search_key(city.name), city.name, city.country, city.admin,
+                  f"{city.lat:.4f}", f"{city.lon:.4f}", str(city.city_id))
+        rows.append("\t".join(f.replace("\t", " ").replace("\n", " ") for f in fields))
+    # Sort by key, ties fall back to name, country and admin
+    rows.sort()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+        offsets = []
+        for row in rows:
+            offsets.append(f.tell())
+            f.write(row.encode("utf-8") + b"\n")
+        table_pos = f.tell()
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(offsets), table_pos))
+    return len(rows)
+
+
+def read_openweather_list(path):
+    """Yield City records from OpenWeather's bulk city.list.json(.gz)"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for item in json.load(f):
+            coord = item.get("coord", {})
+            yield City(item["name"], item.get("country", ""), item.get("state", ""),
+                       float(coord.get("lat", 0)), float(coord.get("lon", 0)), int(item["id"]))
+
+
+if __name__ == "__main__":
+    # python gazetteer.py city.list.json.gz [data/cities.gaz]
+    if len(sys.argv) < 2:
+        print("usage: python gazetteer.py city.list.json[.gz] [output.gaz]")
+        sys.exit(1)
+    output = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+    written = build(read_openweather_list(sys.argv[1]), output)
+    print(f"Wrote {written} cities to {output}")
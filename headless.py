@@ -0,0 +1,178 @@
+import argparse
+import dataclasses
+import json
+import logging
+import signal
+import sys
+import threading
+import time
+
+# Only the non-Qt modules, so this runs on machines without a display (or
+# PyQt5) and starts in a fraction of the GUI's time
+import server_cache
+import speedtest_logger
+import weather
+
+
+log = logging.getLogger(__name__)
+
+
+def speedtest_record(result):
+    """JSON-ready dict for one SpeedTestResult"""
+    record = {"type": "speedtest", "ok": result.ok}
+    record.update(dataclasses.asdict(result))
+    return record
+
+
+def weather_record(location, data):
+    """JSON-ready dict for one weather lookup (data may be an error dict)"""
+    record = {"type": "weather", "ok": "error" not in data, "query": str(location),
+              "checked_at": time.time()}
+    record.update(data)
+    return record
+
+
+class JsonLinesWriter:
+    """Writes one JSON object per line to stdout or appends to a file"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8") if path else sys.stdout
+
+    def write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        # Flush every line so tail -f / log shippers see results straight away
+        self._file.flush()
+
+    def close(self):
+        if self.path:
+            self._file.close()
+
+
+def resolve_location(name):
+    """Use the gazetteer city when the name is unambiguous, else the text"""
+    import gazetteer
+
+    matches = gazetteer.Gazetteer().find(name)
+    return matches[0] if len(matches) == 1 else name
+
+
+def run_checks(args, writer, history=None, servers=None):
+    """One round of every requested check, returns True if all succeeded"""
+    ok = True
+    if args.speedtest:
+        result = speedtest_logger.run_speed_test(
+            secure=not args.insecure, timeout=args.timeout,
+            on_phase=lambda phase: log.info("Starting %s...", phase),
+            threads=args.threads, server_count=args.servers, source_addresses=args.source,
+            server_cache=servers, quick=args.quick, phase_timeout=args.phase_timeout)
+        if not result.ok:
+            log.warning("Speed test failed during %s: %s", result.failed_phase, result.error)
+        if history is not None:
+            history.record(result)
+        writer.write(speedtest_record(result))
+        ok = ok and result.ok
+
+    if args.weather:
+        locations = [resolve_location(name) for name in args.weather]
+        for index, data in weather.iter_many(locations, units=args.units):
+            writer.write(weather_record(locations[index], data))
+            ok = ok and "error" not in data
+    return ok
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Run Morti GUI speed tests and weather checks without a display, "
+                    "writing one JSON object per result (JSON Lines).")
+    parser.add_argument("--speedtest", action="store_true",
+                        help="run a speed test (the default when --weather is not given)")
+    parser.add_argument("--weather", action="append", metavar="CITY", default=[],
+                        help="check the current weather for CITY, can be repeated")
+    parser.add_argument("--units", default="metric", choices=("metric", "imperial", "standard"))
+    parser.add_argument("--weather-per-minute", type=int, default=weather.PER_MINUTE, metavar="N",
+                        help="OpenWeather requests allowed per minute, 0 for no limit")
+    parser.add_argument("--weather-per-day", type=int, default=weather.PER_DAY, metavar="N",
+                        help="OpenWeather requests allowed per day, 0 for no limit")
+    parser.add_argument("--interval", type=float, default=0, metavar="MINUTES",
+                        help="repeat every MINUTES instead of running once")
+    parser.add_argument("--count", type=int, default=0,
+                        help="stop after this many rounds (default: once, or forever with --interval)")
+    parser.add_argument("--output", metavar="FILE",
+                        help="append results to FILE instead of writing to stdout")
+    parser.add_argument("--history", action="store_true",
+                        help="also record speed tests in the GUI's history database")
+    parser.add_argument("--timeout", type=float, default=10,
+                        help="speed test HTTP timeout in seconds")
+    parser.add_argument("--phase-timeout", type=float, default=60, metavar="SECONDS",
+                        help="give up on a speed test phase after this long, keeping what it measured")
+    parser.add_argument("--insecure", action="store_true",
+                        help="talk to speedtest.net over plain HTTP")
+    parser.add_argument("--threads", type=int, metavar="N",
+                        help="connections per server (default: what speedtest.net suggests)")
+    parser.add_argument("--servers", type=int, default=1, metavar="N",
+                        help="test against the N closest servers at once")
+    parser.add_argument("--source", action="append", metavar="IFACE_OR_IP", default=[],
+                        help="bind a stream to this interface or local address, can be repeated")
+    parser.add_argument("--quick", action="store_true",
+                        help="stop each transfer once the speed settles (a few seconds, less data)")
+    parser.add_argument("--no-server-cache", action="store_true",
+                        help="pick the speed test server from scratch instead of reusing the cached one")
+    parser.add_argument("--log-level", default="WARNING",
+                        choices=("DEBUG", "INFO", "WARNING", "ERROR"))
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.weather:
+        args.speedtest = True
+    rounds = args.count or (0 if args.interval else 1)
+    # Logs go to stderr so stdout stays pure JSON Lines
+    logging.basicConfig(level=args.log_level, stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # First SIGINT/SIGTERM finishes the current round, a second one aborts it
+    stop = threading.Event()
+
+    def on_signal(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        log.info("Stopping after the current round")
+        stop.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    weather.configure_quota(args.weather_per_minute or None, args.weather_per_day or None)
+
+    history = None
+    if args.history:
+        import speed_history
+        history = speed_history.HistoryStore()
+    writer = JsonLinesWriter(args.output)
+    # Shared with the GUI, repeat tests on the same network skip server discovery
+    servers = None if args.no_server_cache else server_cache.ServerCache()
+
+    all_ok = True
+    done = 0
+    try:
+        while not stop.is_set():
+            started = time.monotonic()
+            all_ok = run_checks(args, writer, history, servers) and all_ok
+            done += 1
+            if rounds and done >= rounds:
+                break
+            # Keep the period fixed however long the checks took
+            stop.wait(max(0.0, args.interval * 60 - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        all_ok = False
+    finally:
+        writer.close()
+        if history is not None:
+            history.close()
+    return 0 if all_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
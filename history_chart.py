@@ -0,0 +1,375 @@
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+import PyQt5.QtWidgets as QtWidgets
+import PyQt5.QtCore as QtCore
+import PyQt5.QtGui as QtGui
+
+import instrumentation
+import themes
+
+
+def decimate(times, values, bin_seconds):
+    """Min/max of values per fixed-width time bin.
+
+    Bins sit on an absolute grid (bin id = floor(t / bin_seconds)), so
+    panning reuses the same bins. times must be sorted. Returns (bin_ids,
+    mins, maxs) for the non-empty bins only.
+    """
+    if len(times) == 0:
+        return np.empty(0, dtype=np.int64), values[:0], values[:0]
+    return _reduce(np.floor(times / bin_seconds).astype(np.int64), values, values)
+
+
+def merge(bin_ids, mins, maxs, factor):
+    """The next coarser level: bins `factor` times wider, from a finer level"""
+    if len(bin_ids) == 0:
+        return bin_ids, mins, maxs
+    return _reduce(bin_ids // factor, mins, maxs)
+
+
+def _reduce(bin_ids, mins, maxs):
+    # Sorted ids -> each bin is a contiguous run
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bin_ids)) + 1))
+    return bin_ids[starts], np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts)
+
+
+class _Series:
+    """One plotted quantity with its decimation cache.
+
+    Zoom levels are powers of two (level n has 2**n second bins). A level
+    is decimated for the view plus one view width either side, so panning
+    mostly reuses it. Zooming out merges a finer cached level instead of
+    going back to the raw samples, and when the raw samples are needed a
+    level a few octaves finer than asked for is built, so the next few
+    zoom-ins are merges too.
+    """
+
+    MAX_LEVELS = 16
+    RAW_AHEAD = 3  # octaves finer than needed to decimate from the raw samples
+
+    def __init__(self, name, token):
+        self.name = name
+        self.token = token  # colour key in themes.THEMES
+        self.times = np.empty(0)
+        self.values = np.empty(0, dtype=np.float32)
+        # level -> (covered_start, covered_end, bin_ids, mins, maxs)
+        self._levels = OrderedDict()
+        self.raw_level = 0  # at or below this, bins are no wider than the sample spacing
+
+    def set(self, times, values):
+        # Failed runs have no value for this series, leave them out
+        keep = ~np.isnan(values)
+        self.times = times[keep]
+        self.values = values[keep].astype(np.float32)
+        self._levels.clear()
+        spacing = np.median(np.diff(self.times)) if len(self.times) > 1 else 1.0
+        self.raw_level = math.floor(math.log2(max(spacing, 1e-3)))
+
+    def visible(self, level, start, end):
+        """(times, mins, maxs) between start and end, plus one point each side"""
+        if level <= self.raw_level:
+            # Zoomed in past the sample spacing: the raw samples are already
+            # about one per pixel, so slice them instead of decimating
+            first, last = _slice(self.times, start, end)
+            values = self.values[first:last]
+            return self.times[first:last], values, values
+        bin_ids, mins, maxs = self.level(level, start, end)
+        bin_seconds = 2.0 ** level
+        first, last = _slice(bin_ids, math.floor(start / bin_seconds), math.floor(end / bin_seconds))
+        return (bin_ids[first:last] + 0.5) * bin_seconds, mins[first:last], maxs[first:last]
+
+    def level(self, level, start, end):
+        """(bin_ids, mins, maxs) for a level, covering at least start..end"""
+        entry = self._levels.get(level)
+        if entry is None or entry[0] > start or entry[1] < end:
+            with instrumentation.span("chart.decimate"):
+                entry = self._build(level, start, end)
+            self._store(level, entry)
+        self._levels.move_to_end(level)
+        return entry[2:]
+
+    def _build(self, level, start, end):
+        width = end - start
+        start, end = start - width, end + width
+        sources = [cached for cached, entry in self._levels.items()
+                   if cached < level and entry[0] <= start and entry[1] >= end]
+        if sources:
+            source = max(sources)
+        else:
+            source = max(level - self.RAW_AHEAD, self.raw_level + 1)
+            first, last = _slice(self.times, start, end)
+            decimated = decimate(self.times[first:last], self.values[first:last], 2.0 ** source)
+            self._store(source, (start, end) + decimated)
+        bin_ids, mins, maxs = self._levels[source][2:]
+        source_bin = 2.0 ** source
+        first, last = _slice(bin_ids, math.floor(start / source_bin), math.floor(end / source_bin))
+        merged = merge(bin_ids[first:last], mins[first:last], maxs[first:last], 2 ** (level - source))
+        return (start, end) + merged
+
+    def _store(self, level, entry):
+        self._levels[level] = entry
+        if len(self._levels) > self.MAX_LEVELS:
+            self._levels.popitem(last=False)
+
+
+def _slice(sorted_keys, start, end):
+    """Index range of keys in start..end, widened by one on each side"""
+    first = max(np.searchsorted(sorted_keys, start) - 1, 0)
+    last = min(np.searchsorted(sorted_keys, end, side="right") + 1, len(sorted_keys))
+    return first, last
+
+
+class SpeedHistoryChart(QtWidgets.QWidget):
+    """Custom painted download/upload/ping over time chart.
+
+    Each zoom level is decimated once to min/max per pixel-sized time bin
+    and cached, so a repaint only slices the cached bins for the visible
+    range and draws about two points per pixel column, however many
+    samples there are. Wheel zooms around the cursor, dragging pans and
+    a double click shows everything again.
+    """
+
+    LEFT, RIGHT, TOP, BOTTOM = 55, 15, 10, 22
+    PANE_GAP = 24
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.theme = "dark"
+        self.download = _Series("Download", "download")
+        self.upload = _Series("Upload", "upload")
+        self.ping = _Series("Ping", "ping")
+        self._times = np.empty(0)
+        self._columns = {"download": np.empty(0), "upload": np.empty(0), "ping": np.empty(0)}
+        self.view_start = 0.0
+        self.view_end = 1.0
+        self._drag_x = None
+        self.setMinimumSize(300, 180)
+
+    ###############DATA###############
+    def setData(self, times, download, upload, ping):
+        """Replace all samples (arrays of equal length, NaN where missing)"""
+        order = np.argsort(times, kind="stable")
+        self._times = np.asarray(times, dtype=np.float64)[order]
+        self._columns = {
+            "download": np.asarray(download, dtype=np.float64)[order],
+            "upload": np.asarray(upload, dtype=np.float64)[order],
+            "ping": np.asarray(ping, dtype=np.float64)[order],
+        }
+        self._rebuild_series()
+        self.resetView()
+
+    def setRows(self, rows):
+        """setData from (started_at, download, upload, ping) rows, None for missing"""
+        data = np.array(rows, dtype=np.float64).reshape(-1, 4)
+        self.setData(data[:, 0], data[:, 1], data[:, 2], data[:, 3])
+
+    def appendSample(self, started_at, download, upload, ping):
+        """Add one run, following it if the view was showing the latest data"""
+        following = not len(self._times) or self.view_end >= self._times[-1]
+        span = self.view_end - self.view_start
+        values = {"download": download, "upload": upload, "ping": ping}
+        self._times = np.append(self._times, started_at)
+        for key, value in values.items():
+            self._columns[key] = np.append(self._columns[key], np.nan if value is None else value)
+        if len(self._times) > 1 and self._times[-2] > started_at:
+            order = np.argsort(self._times, kind="stable")
+            self._times = self._times[order]
+            self._columns = {key: column[order] for key, column in self._columns.items()}
+        self._rebuild_series()
+        if len(self._times) == 1:
+            self.resetView()
+        elif following:
+            self.setViewRange(max(self._times[-1] - span, self._times[0]), self._times[-1])
+        else:
+            self.update()
+
+    def _rebuild_series(self):
+        for key in ("download", "upload", "ping"):
+            getattr(self, key).set(self._times, self._columns[key])
+
+    def sampleCount(self):
+        return len(self._times)
+
+    ###############VIEW###############
+    def setTheme(self, theme):
+        if theme == self.theme:
+            return
+        self.theme = theme
+        self.update()
+
+    def setViewRange(self, start, end):
+        if end <= start:
+            end = start + 60
+        self.view_start, self.view_end = float(start), float(end)
+        self.update()
+
+    def resetView(self):
+        if len(self._times):
+            start, end = self._times[0], self._times[-1]
+            pad = max((end - start) * 0.02, 30)
+            self.setViewRange(start - pad, end + pad)
+        else:
+            now = time.time()
+            self.setViewRange(now - 86400, now)
+
+    def _plot_rect(self):
+        return QtCore.QRectF(self.LEFT, self.TOP, max(1, self.width() - self.LEFT - self.RIGHT),
+                             max(1, self.height() - self.TOP - self.BOTTOM))
+
+    def _zoom_level(self, plot_width):
+        """Power of two bin width between half a pixel and one pixel"""
+        seconds_per_pixel = (self.view_end - self.view_start) / plot_width
+        return math.floor(math.log2(seconds_per_pixel))
+
+    def wheelEvent(self, event):
+        plot = self._plot_rect()
+        steps = event.angleDelta().y() / 120
+        if not steps:
+            return
+        factor = 0.8 ** steps
+        # Keep the time under the cursor where it is
+        fraction = min(max((event.pos().x() - plot.left()) / plot.width(), 0.0), 1.0)
+        anchor = self.view_start + fraction * (self.view_end - self.view_start)
+        span = max((self.view_end - self.view_start) * factor, 60)
+        self.setViewRange(anchor - fraction * span, anchor + (1 - fraction) * span)
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() == QtCore.Qt.LeftButton:
+            self._drag_x = event.pos().x()
+
+    def mouseMoveEvent(self, event):
+        if self._drag_x is None:
+            return
+        dx = event.pos().x() - self._drag_x
+        self._drag_x = event.pos().x()
+        shift = -dx / self._plot_rect().width() * (self.view_end - self.view_start)
+        self.setViewRange(self.view_start + shift, self.view_end + shift)
+
+    def mouseReleaseEvent(self, event):
+        self._drag_x = None
+
+    def mouseDoubleClickEvent(self, event):
+        self.resetView()
+
+    ###############PAINTING###############
+    def paintEvent(self, event):
+        with instrumentation.span("chart.paint"):
+            self._paint()
+
+    def _paint(self):
+        colours = themes.tokens(self.theme)
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtGui.QColor(colours["base"]))
+
+        plot = self._plot_rect()
+        # Throughput gets the top two thirds, ping the rest
+        pane_height = (plot.height() - self.PANE_GAP) / 3
+        speed_pane = QtCore.QRectF(plot.left(), plot.top(), plot.width(), pane_height * 2)
+        ping_pane = QtCore.QRectF(plot.left(), speed_pane.bottom() + self.PANE_GAP,
+                                  plot.width(), pane_height)
+
+        level = self._zoom_level(plot.width())
+        speed_visible = [series.visible(level, self.view_start, self.view_end)
+                         for series in (self.download, self.upload)]
+        ping_visible = [self.ping.visible(level, self.view_start, self.view_end)]
+
+        self._draw_time_axis(painter, plot, colours)
+        self._draw_pane(painter, speed_pane, speed_visible, (self.download, self.upload),
+                        "Mbps", colours)
+        self._draw_pane(painter, ping_pane, ping_visible, (self.ping,), "ms", colours)
+
+        if not len(self._times):
+            painter.setPen(QtGui.QColor(colours["disabled_text"]))
+            painter.drawText(plot, QtCore.Qt.AlignCenter, "No speed tests recorded yet")
+
+    def _x(self, plot, times):
+        return plot.left() + (times - self.view_start) * (plot.width() / (self.view_end - self.view_start))
+
+    def _draw_pane(self, painter, pane, visible, series_list, unit, colours):
+        top = max((float(maxs.max()) for _, _, maxs in visible if len(maxs)), default=0.0)
+        top = _nice_ceiling(top * 1.1) if top > 0 else 1.0
+
+        # Horizontal grid and y labels
+        painter.setPen(QtGui.QColor(colours["grid"]))
+        for i in range(5):
+            y = pane.bottom() - pane.height() * i / 4
+            painter.drawLine(QtCore.QPointF(pane.left(), y), QtCore.QPointF(pane.right(), y))
+        painter.setPen(QtGui.QColor(colours["text"]))
+        for i in range(0, 5, 2):
+            y = pane.bottom() - pane.height() * i / 4
+            painter.drawText(QtCore.QRectF(0, y - 8, self.LEFT - 6, 16),
+                             QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter,
+                             _format_value(top * i / 4))
+
+        painter.save()
+        painter.setClipRect(pane)
+        y_scale = pane.height() / top
+        legend_x = pane.left() + 6
+        for series, (centres, mins, maxs) in zip(series_list, visible):
+            colour = QtGui.QColor(colours[series.token])
+            if len(centres):
+                xs = self._x(pane, centres)
+                # Each bin is a vertical stroke from its min to its max,
+                # joined to the next one: the envelope of the raw samples
+                points = np.empty((len(xs) * 2, 2))
+                points[0::2, 0] = xs
+                points[1::2, 0] = xs
+                points[0::2, 1] = pane.bottom() - mins * y_scale
+                points[1::2, 1] = pane.bottom() - maxs * y_scale
+                painter.setPen(QtGui.QPen(colour, 1))  # 1px: the fast unstroked line path
+                painter.drawPolyline(_polygon(points))
+            painter.setPen(colour)
+            painter.drawText(QtCore.QPointF(legend_x, pane.top() + 12), series.name)
+            legend_x += painter.fontMetrics().horizontalAdvance(series.name) + 12
+        painter.setPen(QtGui.QColor(colours["text"]))
+        painter.drawText(QtCore.QPointF(legend_x, pane.top() + 12), f"({unit})")
+        painter.restore()
+
+    def _draw_time_axis(self, painter, plot, colours):
+        span = self.view_end - self.view_start
+        # Smallest step that keeps labels ~90 px apart
+        step = next((s for s in _TIME_STEPS if s / span * plot.width() >= 90), _TIME_STEPS[-1])
+        fmt = "%H:%M" if step < 86400 else "%d %b" if step < 30 * 86400 else "%b %Y"
+        # Ticks on round local times (midnight for day steps), not UTC ones
+        offset = time.localtime(self.view_start).tm_gmtoff
+        tick = math.ceil((self.view_start + offset) / step) * step - offset
+        while tick <= self.view_end:
+            x = plot.left() + (tick - self.view_start) / span * plot.width()
+            painter.setPen(QtGui.QColor(colours["grid"]))
+            painter.drawLine(QtCore.QPointF(x, plot.top()), QtCore.QPointF(x, plot.bottom()))
+            painter.setPen(QtGui.QColor(colours["text"]))
+            label = time.strftime(fmt, time.localtime(tick))
+            painter.drawText(QtCore.QRectF(x - 45, plot.bottom() + 4, 90, 16),
+                             QtCore.Qt.AlignHCenter | QtCore.Qt.AlignTop, label)
+            tick += step
+
+
+_TIME_STEPS = (60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600,
+               86400, 2 * 86400, 7 * 86400, 14 * 86400, 30 * 86400, 91 * 86400, 365 * 86400)
+
+
+def _polygon(points):
+    """QPolygonF from an (n, 2) float array, filled in place instead of
+    building a QPointF per point"""
+    polygon = QtGui.QPolygonF(len(points))
+    buffer = polygon.data()
+    buffer.setsize(points.size * 8)
+    np.frombuffer(buffer, dtype=np.float64)[:] = points.ravel()
+    return polygon
+
+
+def _nice_ceiling(value):
+    """Round up to 1, 2 or 5 times a power of ten"""
+    magnitude = 10 ** math.floor(math.log10(value))
+    for multiple in (1, 2, 5, 10):
+        if value <= multiple * magnitude:
+            return multiple * magnitude
+    return 10 * magnitude
+
+
+def _format_value(value):
+    return f"{value:.0f}" if value >= 10 or value == 0 else f"{value:.1f}"
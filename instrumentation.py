@@ -0,0 +1,132 @@
+import bisect
+import json
+import math
+import threading
+import time
+
+
+# Off by default. While off, span() hands back one shared do-nothing
+# object, so an instrumented call costs a flag check and nothing else.
+ENABLED = False
+
+# Histogram bucket upper bounds in ms: 1 us up to ~10 minutes, each
+# bucket 20% wider than the last, so percentiles are within ~10%
+_GROWTH = 1.2
+BUCKET_BOUNDS = [0.001 * _GROWTH ** i for i in range(int(math.log(6e8, _GROWTH)) + 2)]
+
+
+class Histogram:
+    """Fixed log-scale buckets: constant memory however many samples"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """Approximate p-th percentile (0-100) in ms"""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                # Geometric middle of the bucket, never outside what was seen
+                upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                estimate = upper / math.sqrt(_GROWTH)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 4) if self.count else 0.0,
+            "min_ms": round(self.min, 4) if self.count else 0.0,
+            "max_ms": round(self.max, 4),
+            "p50_ms": round(self.percentile(50), 4),
+            "p95_ms": round(self.percentile(95), 4),
+            "p99_ms": round(self.percentile(99), 4),
+        }
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+
+def record(name, ms):
+    """Add one duration (ms) to the histogram for name"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(ms)
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """with span("weather.request"): ...  times the block when enabled"""
+    if not ENABLED:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def snapshot():
+    """{span name: count/mean/min/max/p50/p95/p99} for everything recorded"""
+    with _lock:
+        return {name: histogram.summary() for name, histogram in sorted(_histograms.items())}
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def export_json(path=None):
+    """Snapshot as JSON text, also written to path if given"""
+    text = json.dumps({"exported_at": time.time(), "spans": snapshot()}, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return text
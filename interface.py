@@ -1,185 +1,183 @@
 
+# Started before anything else so the startup report includes import time
+from startup_timing import StartupTimer
+STARTUP = StartupTimer()
+
 import PyQt5
+import json
+import logging
+import time
 import PyQt5.QtWidgets as QtWidgets
 import PyQt5.QtCore as QtCore
+# These stay light at import time: speedtest, requests, dotenv and numpy
+# are only imported once a feature actually needs them
 import speedtest_logger
+import speed_history
 import weather
+import weather_cache
+import server_cache
+import gazetteer
+import themes
+import log_console
+import instrumentation
+from speedtest_scheduler import SpeedTestScheduler
+from workers import WorkerPool
+
+STARTUP.mark("imports")
 from speedometer_gauge import SpeedometerGauge
 
+log = logging.getLogger(__name__)
+
 class SpeedTestThread(QtCore.QThread):
-    speedTestCompleted = QtCore.pyqtSignal(str, str, float, float)
+    speedTestCompleted = QtCore.pyqtSignal(object)  # speedtest_logger.SpeedTestResult
     progressUpdate = QtCore.pyqtSignal(str)
     testingDownload = QtCore.pyqtSignal()  # Signal when download starts
     testingUpload = QtCore.pyqtSignal()    # Signal when upload starts
+    throughputSample = QtCore.pyqtSignal(object)  # speedtest_logger.ProgressSample
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # SpeedTestSession options (threads, server_count, source_addresses),
+        # set by the window before each start()
+        self.options = {}
+        self.session = None
+        self.phase = None  # phase under way, for a run that crashes
+        self.cancel_requested = False
+        # speedtest_worker.SpeedTestWorker to run tests in a child process, or None
+        self.worker = None
+
+    def cancel(self):
+        # Safe from the GUI thread: whichever of this and run() goes second sees the other
+        self.cancel_requested = True
+        if self.worker is not None:
+            self.worker.cancel()
+        session = self.session
+        if session is not None:
+            session.cancel()
 
     def run(self):
-        print("Thread run() started!")
-        try:
-            print("Emitting first progress...")
-            self.progressUpdate.emit("Starting WIFI speed test...")
+        log.debug("Speed test thread started")
+        self.progressUpdate.emit("Starting WIFI speed test...")
 
-            print("Calling download...")
+        self.phase = None
+        try:
+            result = self.run_test()
+        except Exception as e:
+            # Still hand back a result, the scheduler waits for one before the next run
+            log.exception("Speed test crashed")
+            result = speedtest_logger.SpeedTestResult(error=str(e) or type(e).__name__,
+                                                      failed_phase=self.phase or "discovery")
+            result.finished_at = time.time()
+        finally:
+            self.session = None
+
+        if result.ok:
+            self.progressUpdate.emit("WIFI speed test completed.")
+        elif result.cancelled:
+            log.info("Speed test cancelled during %s", result.failed_phase)
+            self.progressUpdate.emit(f"Speed test cancelled during {result.failed_phase}.")
+        else:
+            log.warning("Speed test failed during %s: %s", result.failed_phase, result.error)
+            self.progressUpdate.emit(f"Error during {result.failed_phase}: {result.error}")
+        self.speedTestCompleted.emit(result)
+        log.debug("Speed test result emitted")
+
+    def run_test(self):
+        # One session: server discovery happens once for both directions.
+        # Live samples come from the meter thread at a fixed rate (5 per second)
+        if self.worker is not None:
+            # Same session, run in the worker process; phases and samples come back over its pipe
+            return self.worker.run(dict(self.options, sample_interval=0.2), on_phase=self.on_phase,
+                                   on_progress=self.throughputSample.emit,
+                                   cancel_requested=lambda: self.cancel_requested)
+        self.session = session = speedtest_logger.SpeedTestSession(
+            on_progress=self.throughputSample.emit, sample_interval=0.2, **self.options)
+        if self.cancel_requested:
+            session.cancel()
+        return session.run(on_phase=self.on_phase)
+
+    def on_phase(self, phase):
+        # Called from the session as each phase starts
+        self.phase = phase
+        log.info("Starting %s...", phase)
+        if phase == "discovery":
+            self.progressUpdate.emit("Finding best server...")
+        elif phase == "download":
             self.progressUpdate.emit("Running download test...")
             self.testingDownload.emit()
-            download_result = speedtest_logger.download()
-            download_mbps = 0
-            try:
-                if "error" not in download_result.lower():
-                    download_mbps = float(download_result.split(":")[1].strip().split()[0])
-            except:
-                pass
-            print(f"Download done: {download_result}")
-
-            print("Calling upload...")
+        elif phase == "upload":
             self.progressUpdate.emit("Running upload test...")
             self.testingUpload.emit()
-            upload_result = speedtest_logger.upload()
-            upload_mbps = 0
-            try:
-                if "error" not in upload_result.lower():
-                    upload_mbps = float(upload_result.split(":")[1].strip().split()[0])
-            except:
-                pass
-            print(f"Upload done: {upload_result}")
-
-            self.progressUpdate.emit("WIFI speed test completed.")
-            self.speedTestCompleted.emit(download_result, upload_result, download_mbps, upload_mbps)
-            print("Signals emitted!")
-        except Exception as e:
-            print(f"Exception in thread: {e}")
-            self.progressUpdate.emit(f"Error during speed test: {e}")
     
 
 ######################MAIN WINDOW#####################
 class MainWindow(QtWidgets.QMainWindow):
+    HOME_PAGE, SPEED_PAGE, WEATHER_PAGE, SETTINGS_PAGE, DIAGNOSTICS_PAGE = range(5)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Morti GUI")
         self.setGeometry(100, 100, 800, 600)
         
-        # Track current theme
-        self.is_dark_mode = True
-        
-        # Define themes
-        self.dark_theme = """
-            QMainWindow {
-                background-color: #1e1e1e;
-            }
-            QWidget {
-                background-color: #1e1e1e;
-                color: #ffffff;
-            }
-            QPushButton {
-                background-color: #0d7377;
-                color: white;
-                border: none;
-                border-radius: 5px;
-                padding: 10px;
-                font-size: 14px;
-            }
-            QPushButton:hover {
-                background-color: #14a085;
-            }
-            QPushButton:pressed {
-                background-color: #0a5f63;
-            }
-            QPushButton:disabled {
-                background-color: #555555;
-                color: #888888;
-            }
-            QTextEdit {
-                background-color: #252525;
-                color: #ffffff;
-                border: 1px solid #3a3a3a;
-                border-radius: 5px;
-                padding: 5px;
-            }
-            QLineEdit {
-                background-color: #252525;
-                color: #ffffff;
-                border: 1px solid #3a3a3a;
-                border-radius: 5px;
-                padding: 5px;
-            }
-            QLabel {
-                color: #ffffff;
-            }
-            QDockWidget {
-                background-color: #2d2d2d;
-                color: #ffffff;
-                titlebar-close-icon: url(close.png);
-                titlebar-normal-icon: url(float.png);
-            }
-            """
-    
-        self.light_theme = """
-            QMainWindow {
-                background-color: #f5f5f5;
-            }
-            QWidget {
-                background-color: #f5f5f5;
-                color: #000000;
-            }
-            QPushButton {
-                background-color: #0d7377;
-                color: white;
-                border: none;
-                border-radius: 5px;
-                padding: 10px;
-                font-size: 14px;
-            }
-            QPushButton:hover {
-                background-color: #14a085;
-            }
-            QPushButton:pressed {
-                background-color: #0a5f63;
-            }
-            QPushButton:disabled {
-                background-color: #cccccc;
-                color: #666666;
-            }
-            QTextEdit {
-                background-color: #ffffff;
-                color: #000000;
-                border: 1px solid #cccccc;
-                border-radius: 5px;
-                padding: 5px;
-            }
-            QLineEdit {
-                background-color: #ffffff;
-                color: #000000;
-                border: 1px solid #cccccc;
-                border-radius: 5px;
-                padding: 5px;
-            }
-            QLabel {
-                color: #000000;
-            }
-            QDockWidget {
-                background-color: #e0e0e0;
-                color: #000000;
-            }
-        """
-    
-        # Apply dark theme by default
-        self.setStyleSheet(self.dark_theme)
+
+        # Every speed test result is kept on disk (written off the GUI thread)
+        self.history = speed_history.HistoryStore()
+        # Best speedtest servers per network, so repeat tests skip discovery
+        self.server_cache = server_cache.ServerCache()
+        # Child process for speed tests, only with "speedtest/out_of_process" on
+        self._speedtest_worker = None
+
+        # Weather lookups go through a TTL/LRU cache that is kept on disk
+        self.weather_cache = weather_cache.WeatherCache(path=weather_cache.DEFAULT_PATH)
+        # Forecast cache is created on first use (forecast pulls in numpy)
+        self._forecast_cache = None
+        self.forecast_series = None
+
+        # Persistent app settings and the unattended test scheduler
+        self.settings = QtCore.QSettings("Morti", "Morti GUI")
+
+        # OpenWeather budget (0 = no limit), the daily part carries over restarts
+        weather.configure_quota(int(self.settings.value("weather/per_minute", weather.PER_MINUTE)) or None,
+                                int(self.settings.value("weather/per_day", weather.PER_DAY)) or None)
+        quota_state = self.settings.value("weather/quota_state", "")
+        if quota_state:
+            weather.QUOTA.restore(json.loads(quota_state))
+        # Span timings are only collected when switched on in Diagnostics
+        instrumentation.enable(self.settings.value("diagnostics/enabled", False, type=bool))
+
+        # Shared pool for weather work, identical requests in flight are merged
+        self.workers = WorkerPool(max_threads=4, parent=self)
+
+        # One long-lived speed test thread, restarted for every run
+        self.speed_thread = SpeedTestThread()
+        self.scheduler = SpeedTestScheduler(
+            self.start_speed_test,
+            interval_minutes=int(self.settings.value("scheduler/interval_minutes", 30)),
+            jitter=int(self.settings.value("scheduler/jitter_percent", 10)) / 100,
+            parent=self)
+        if self.settings.value("scheduler/enabled", False, type=bool):
+            self.scheduler.start()
         
+        # Colours come from one palette per theme; switching swaps the palette
+        # instead of re-parsing a window-wide stylesheet
+        QtWidgets.QApplication.setStyle("Fusion")
+        self.theme = themes.theme_name(self.settings.value("appearance/theme", themes.DEFAULT_THEME))
 
         self.stacked_widget = QtWidgets.QStackedWidget()
 
-                #Create Different Pages
-        self.home_page = self.create_home_page()
-        self.wifi_speed_page = self.create_speedtest_page()
-        self.weather_page = self.create_weather_page()
-        self.settings_page = self.create_settings_page()
-
-
-
-        #Add pages to stacked widget
-        self.stacked_widget.addWidget(self.home_page)          # Index 0
-        self.stacked_widget.addWidget(self.wifi_speed_page)    # Index 1
-        self.stacked_widget.addWidget(self.weather_page)       # Index 2
-        self.stacked_widget.addWidget(self.settings_page)      # Index 3
+        # Pages are built the first time they are shown, until then the
+        # stacked widget holds an empty placeholder at their index
+        self.page_builders = [
+            self.create_home_page,       # Index 0
+            self.create_speedtest_page,  # Index 1
+            self.create_weather_page,    # Index 2
+            self.create_settings_page,   # Index 3
+            self.create_diagnostics_page,  # Index 4
+        ]
+        self.pages = [None] * len(self.page_builders)
+        for _ in self.page_builders:
+            self.stacked_widget.addWidget(QtWidgets.QWidget())
+        self.show_page(self.HOME_PAGE)
 
             
         #Setting as central widget
@@ -198,27 +196,52 @@ class MainWindow(QtWidgets.QMainWindow):
 
             #Create sidebar dock
         home_btn = QtWidgets.QPushButton("Home") 
-        home_btn.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
+        home_btn.clicked.connect(lambda: self.show_page(self.HOME_PAGE))
         sidebar_layout.addWidget(home_btn)
 
 
         speed_btn = QtWidgets.QPushButton("Wifi Speed")
-        speed_btn.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(1))
+        speed_btn.clicked.connect(lambda: self.show_page(self.SPEED_PAGE))
         sidebar_layout.addWidget(speed_btn)
 
         weather_btn = QtWidgets.QPushButton("Weather")
-        weather_btn.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(2))
+        weather_btn.clicked.connect(lambda: self.show_page(self.WEATHER_PAGE))
         sidebar_layout.addWidget(weather_btn)
 
         settings_btn = QtWidgets.QPushButton("Settings")
-        settings_btn.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(3))
+        settings_btn.clicked.connect(lambda: self.show_page(self.SETTINGS_PAGE))
         sidebar_layout.addWidget(settings_btn)
 
+        diagnostics_btn = QtWidgets.QPushButton("Diagnostics")
+        diagnostics_btn.clicked.connect(lambda: self.show_page(self.DIAGNOSTICS_PAGE))
+        sidebar_layout.addWidget(diagnostics_btn)
+
 
         sidebar_content.setLayout(sidebar_layout)
+        themes.style_buttons(sidebar_content)
         sidebar.setWidget(sidebar_content)
         self.addDockWidget(QtCore.Qt.LeftDockWidgetArea, sidebar)
 
+        self.apply_theme(self.theme)
+
+    def ensure_page(self, index):
+        # Build a page on first use and swap it in for its placeholder
+        if self.pages[index] is None:
+            page = self.page_builders[index]()
+            themes.style_buttons(page)
+            placeholder = self.stacked_widget.widget(index)
+            self.stacked_widget.insertWidget(index, page)
+            self.stacked_widget.removeWidget(placeholder)
+            placeholder.deleteLater()
+            self.pages[index] = page
+        return self.pages[index]
+
+    def show_page(self, index):
+        self.stacked_widget.setCurrentWidget(self.ensure_page(index))
+        if index == self.WEATHER_PAGE:
+            self.refresh_quota_label()
+            self.quota_timer.start()
+
     def create_home_page(self):
         page = QtWidgets.QWidget()
         layout = QtWidgets.QVBoxLayout()
@@ -228,7 +251,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
         #Home page content
         title = QtWidgets.QLabel("Welcome to Morti GUI")
-        title.setStyleSheet("font-size: 24px; font-weight: bold;")
+        title.setFont(themes.heading_font(title, 24))
         title.setAlignment(QtCore.Qt.AlignCenter) 
 
         subtitle = QtWidgets.QLabel("Select an option from the sidebar to get started.")
@@ -256,7 +279,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
         #Ttile  
         title = QtWidgets.QLabel("WIFI Speed Test")
-        title.setStyleSheet("font-size: 24px; font-weight: bold;")
+        title.setFont(themes.heading_font(title, 24))
         title.setAlignment(QtCore.Qt.AlignCenter)
         layout.addWidget(title)
 
@@ -270,6 +293,7 @@ class MainWindow(QtWidgets.QMainWindow):
         download_container = QtWidgets.QVBoxLayout()
         
         self.download_gauge = SpeedometerGauge(max_value=1000, label="DOWNLOAD")
+        self.download_gauge.setAutoScale(True)  # multi-gigabit links go past 1000
         self.download_gauge.setFixedSize(300, 300)
         
         download_container.addWidget(self.download_gauge, alignment=QtCore.Qt.AlignCenter)
@@ -279,9 +303,14 @@ class MainWindow(QtWidgets.QMainWindow):
         upload_container = QtWidgets.QVBoxLayout()
         
         self.upload_gauge = SpeedometerGauge(max_value=500, label="UPLOAD")
+        self.upload_gauge.setAutoScale(True)
         self.upload_gauge.setFixedSize(300, 300)
         
         upload_container.addWidget(self.upload_gauge, alignment=QtCore.Qt.AlignCenter)
+
+        # The page may be built after a theme switch
+        self.download_gauge.setTheme(self.theme)
+        self.upload_gauge.setTheme(self.theme)
         
         #ADD BOTH METERS TO MAIN LAYOUT
         meters_layout.addStretch() #Keep this in centre
@@ -297,78 +326,133 @@ class MainWindow(QtWidgets.QMainWindow):
         self.speedtest_button.clicked.connect(self.on_button_click)  # ADD THIS
         
         #New button layout
+        # Quick mode stops each phase once the speed settles, less data on metered links
+        self.quick_checkbox = QtWidgets.QCheckBox("Quick test")
+        self.quick_checkbox.setToolTip("Stop each transfer once the speed settles (a few seconds, less data)")
+        self.quick_checkbox.setChecked(self.settings.value("speedtest/quick", False, type=bool))
+        self.quick_checkbox.toggled.connect(lambda on: self.settings.setValue("speedtest/quick", on))
+
         button_layout = QtWidgets.QHBoxLayout()
         button_layout.addStretch()
         button_layout.addWidget(self.speedtest_button)
+        button_layout.addWidget(self.quick_checkbox)
         button_layout.addStretch()
         layout.addLayout(button_layout)
 
         #Console widgets
-        self.speedtest_console = QtWidgets.QTextEdit()
-        self.speedtest_console.setReadOnly(True)
+        self.speedtest_console = log_console.LogConsole(max_lines=500)
         self.speedtest_console.setMaximumHeight(100)
         self.speedtest_console.append("Click 'Run Speed Test' to begin...\n")
         layout.addWidget(self.speedtest_console)
 
+        # Trend of every recorded run, loaded off the GUI thread
+        from history_chart import SpeedHistoryChart  # numpy, only once this page is opened
+        self.history_chart = SpeedHistoryChart()
+        self.history_chart.setMinimumHeight(220)
+        self.history_chart.setTheme(self.theme)
+        layout.addWidget(self.history_chart)
+        self.workers.submit("load_history", load_history_job, self.history,
+                            on_result=self.on_history_loaded)
+
+        # Signals are wired once, the same thread object is reused for every run
+        self.speed_thread.progressUpdate.connect(self.update_progress)
+        self.speed_thread.speedTestCompleted.connect(self.show_results)
+        self.speed_thread.testingDownload.connect(self.start_download_animation)
+        self.speed_thread.testingUpload.connect(self.start_upload_animation)
+        self.speed_thread.throughputSample.connect(self.update_live_speed)
+        self.speed_thread.finished.connect(self.on_test_finished)
+
         page.setLayout(layout)
         return page
     
-    def show_results(self, download_result, upload_result, download_mbps, upload_mbps):
+    def show_results(self, result):
         #This method will be called when the speed test is completed
-        self.speedtest_console.append(f"{download_result}\n")
-        self.speedtest_console.append(f"{upload_result}\n")
-        self.speedtest_console.append("Speed tests completed.\n")
-        
-        # Stop animation and show final results
-        if hasattr(self, 'animate_timer'):
-            self.animate_timer.stop()
+        if len(result.streams) > 1:
+            for stream in result.streams:
+                self.speedtest_console.append(format_stream(stream))
+        elif result.server:
+            self.speedtest_console.append(f"Server: {result.server_name}")
+        if result.ping_ms is not None:
+            self.speedtest_console.append(f"Ping: {result.ping_ms:.1f} ms")
+        if result.download_mbps is not None:
+            self.speedtest_console.append(f"Download speed: {result.download_mbps:.2f} Mbps"
+                                          f"{format_quick(result, 'download')}")
+        if result.upload_mbps is not None:
+            self.speedtest_console.append(f"Upload speed: {result.upload_mbps:.2f} Mbps"
+                                          f"{format_quick(result, 'upload')}")
+        timings = ", ".join(f"{phase} {secs:.1f}s" for phase, secs in result.timings.items())
+        self.speedtest_console.append(f"Timings: {timings}\n")
+        if result.ok:
+            self.speedtest_console.append("Speed tests completed.\n")
         
-        # Update gauges with final values
-        self.download_gauge.setValue(download_mbps)
-        self.upload_gauge.setValue(upload_mbps)
-    
-    def animate_download(self):
-        # Pulsing animation while downloading
-        current = self.download_gauge.value()
-        self.download_gauge.setValue((current + 50) % 1000)
-    
-    def animate_upload(self):
-        # Pulsing animation while uploading
-        current = self.upload_gauge.value()
-        self.upload_gauge.setValue((current + 30) % 500)
+        # Queue the run for the history database. A cancelled run says nothing
+        # about the network, so it's neither stored nor plotted
+        if not result.cancelled:
+            self.history.record(result)
+            self.history_chart.appendSample(*speed_history.chart_sample(result))
+        # A cancelled run is neither a failure nor a success for the backoff
+        self.scheduler.report_result(result.ok, cancelled=result.cancelled)
+
+        # Ease gauges to the final values (phases that never ran go back to 0)
+        self.download_gauge.setTargetValue(result.download_mbps or 0)
+        self.upload_gauge.setTargetValue(result.upload_mbps or 0)
+
+    def on_history_loaded(self, columns, error=None):
+        if error is not None:
+            log.warning("Could not load speed history: %s", error)
+            return
+        self.history_chart.setData(*columns)
+
+    def update_live_speed(self, sample):
+        # Follow the smoothed throughput measured by the running phase
+        if sample.phase == "download":
+            self.download_gauge.setTargetValue(sample.smoothed_mbps)
+        elif sample.phase == "upload":
+            self.upload_gauge.setTargetValue(sample.smoothed_mbps)
 
     def on_button_click(self):
+        # The same button cancels a running test
+        if self.speed_thread.isRunning():
+            self.cancel_speed_test()
+        else:
+            self.start_speed_test()
+
+    def cancel_speed_test(self):
+        self.speedtest_button.setEnabled(False)
+        self.speedtest_button.setText("Cancelling...")
+        self.speed_thread.cancel()
+
+    def start_speed_test(self):
+        # Returns False instead of starting a second, competing test
+        if self.speed_thread.isRunning():
+            return False
+        # Scheduled runs can start before anyone opened the speed test page
+        self.ensure_page(self.SPEED_PAGE)
+
         # Reset gauges
-        self.download_gauge.setValue(0)
-        self.upload_gauge.setValue(0)
+        self.download_gauge.setTargetValue(0)
+        self.upload_gauge.setTargetValue(0)
+        self.download_gauge.resetScale()
+        self.upload_gauge.resetScale()
         
-        # Create and start the speed test thread
-        self.speedtest_button.setEnabled(False)
-        self.speedtest_button.setText("Running...")
+        # The button cancels while the speed test thread runs
+        self.speedtest_button.setText("Cancel")
         self.speedtest_console.clear()
 
         # Start thread
-        self.thread = SpeedTestThread()
-        self.thread.progressUpdate.connect(self.update_progress)
-        self.thread.speedTestCompleted.connect(self.show_results)
-        self.thread.testingDownload.connect(self.start_download_animation)
-        self.thread.testingUpload.connect(self.start_upload_animation)
-        self.thread.start()
-        self.thread.finished.connect(self.on_test_finished)
+        self.speed_thread.options = self.speedtest_options()
+        self.speed_thread.cancel_requested = False
+        self.speed_thread.worker = self.speedtest_worker()
+        self.speed_thread.start()
+        return True
     
     def start_download_animation(self):
-        # Start animating download bar
-        self.animate_timer = QtCore.QTimer()
-        self.animate_timer.timeout.connect(self.animate_download)
-        self.animate_timer.start(100)  # Update every 100ms
+        # Download phase starting, needle follows live samples from here
+        self.download_gauge.setValue(0)
     
     def start_upload_animation(self):
-        # Stop download animation, start upload
-        if hasattr(self, 'animate_timer'):
-            self.animate_timer.stop()
-        self.animate_timer = QtCore.QTimer()
-        self.animate_timer.timeout.connect(self.animate_upload)
-        self.animate_timer.start(100)
+        # Upload phase starting
+        self.upload_gauge.setValue(0)
     
     def update_progress(self, message):
         # This method will be called to update progress messages
@@ -394,44 +478,146 @@ class MainWindow(QtWidgets.QMainWindow):
         self.location_input = QtWidgets.QLineEdit()
         self.location_input.setPlaceholderText("Enter city name...")
         self.location_input.setFixedHeight(30)
+
+        # Autocomplete from the offline city index (opened on first keystroke)
+        self.gazetteer = gazetteer.Gazetteer()
+        self.city_suggestions = {}  # completer label -> gazetteer.City
+        self.city_model = QtCore.QStringListModel(self)
+        completer = QtWidgets.QCompleter(self.city_model, self)
+        completer.setCompletionMode(QtWidgets.QCompleter.UnfilteredPopupCompletion)
+        completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+        self.location_input.setCompleter(completer)
+        self.location_input.textEdited.connect(self.update_city_suggestions)
         
         self.weather_button = QtWidgets.QPushButton("Get Weather")
         self.weather_button.setFixedSize(200, 50)
         self.weather_button.clicked.connect(self.on_weather_click)
         
-        self.console = QtWidgets.QTextEdit()
-        self.console.setReadOnly(True)
+        self.console = log_console.LogConsole(max_lines=1000)
         self.console.append("Enter a city name and click 'Get Weather'\n")
         
+        self.forecast_button = QtWidgets.QPushButton("Get Forecast")
+        self.forecast_button.setFixedSize(200, 50)
+        self.forecast_button.clicked.connect(self.on_forecast_click)
+
+        # Switching view re-renders the cached series, no refetch or reparse
+        self.forecast_view = QtWidgets.QComboBox()
+        self.forecast_view.addItems(["Daily summary", "Every 3 hours"])
+        self.forecast_view.currentIndexChanged.connect(self.render_forecast)
+
+        self.forecast_table = QtWidgets.QTableWidget()
+        self.forecast_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.forecast_table.verticalHeader().setVisible(False)
+
+        button_row = QtWidgets.QHBoxLayout()
+        button_row.addWidget(self.weather_button)
+        button_row.addWidget(self.forecast_button)
+        button_row.addStretch()
+        button_row.addWidget(self.forecast_view)
+        
+        # Watchlist: saved locations refreshed together
+        self.watchlist = self.load_watchlist()
+        self.watchlist_table = QtWidgets.QTableWidget(0, 6)
+        self.watchlist_table.setHorizontalHeaderLabels(
+            ["Location", "°C", "Description", "Humidity %", "Wind m/s", "Status"])
+        self.watchlist_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.watchlist_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.watchlist_table.verticalHeader().setVisible(False)
+        self.fill_watchlist_table()
+
+        add_watch_btn = QtWidgets.QPushButton("Add to Watchlist")
+        add_watch_btn.clicked.connect(self.on_add_to_watchlist)
+        remove_watch_btn = QtWidgets.QPushButton("Remove Selected")
+        remove_watch_btn.clicked.connect(self.on_remove_from_watchlist)
+        self.refresh_watch_btn = QtWidgets.QPushButton("Refresh Watchlist")
+        self.refresh_watch_btn.clicked.connect(self.on_refresh_watchlist)
+
+        watch_row = QtWidgets.QHBoxLayout()
+        watch_row.addWidget(add_watch_btn)
+        watch_row.addWidget(remove_watch_btn)
+        watch_row.addWidget(self.refresh_watch_btn)
+        watch_row.addStretch()
+        
         layout.addWidget(self.location_input)
-        layout.addWidget(self.weather_button)
+        layout.addLayout(button_row)
         layout.addWidget(self.console)
+        layout.addWidget(self.forecast_table)
+        layout.addLayout(watch_row)
+        layout.addWidget(self.watchlist_table)
+
+        # Remaining API budget, refreshed once a second while this page is
+        # showing (show_page starts the timer, the tick stops it once the page
+        # is gone and nothing is queued)
+        self.quota_label = QtWidgets.QLabel()
+        layout.addWidget(self.quota_label)
+        self.quota_timer = QtCore.QTimer(self)
+        self.quota_timer.setInterval(1000)
+        self.quota_timer.timeout.connect(self.on_quota_tick)
         
         page.setLayout(layout)
         return page
 
-    def on_weather_click(self):
+    def on_quota_tick(self):
+        if self.stacked_widget.currentIndex() == self.WEATHER_PAGE:
+            self.refresh_quota_label()
+        elif not weather.QUOTA.remaining()["queued"]:
+            self.quota_timer.stop()
+
+    def refresh_quota_label(self):
+        self.quota_label.setText(format_quota(weather.QUOTA.remaining(), weather.PER_MINUTE,
+                                              weather.PER_DAY, weather.coalesced))
+
+    def update_city_suggestions(self, text):
+        if len(text.strip()) < 2 or not self.gazetteer.available:
+            return
+        cities = self.gazetteer.complete(text, limit=15)
+        self.city_suggestions = {city.label: city for city in cities}
+        self.city_model.setStringList(list(self.city_suggestions))
+
+    def selected_location(self):
+        # Returns a gazetteer.City when the input is unambiguous, else the text
         location = self.location_input.text().strip()
         if not location:
             self.console.append(f"Please enter a city name.\n")
+            return None
+
+        # A picked suggestion is looked up by its id, not by its name
+        location = self.city_suggestions.get(location, location)
+        if isinstance(location, str) and self.gazetteer.available:
+            matches = self.gazetteer.find(location)
+            if len(matches) == 1:
+                location = matches[0]
+            elif len(matches) > 1:
+                self.console.append(f"{len(matches)} places are called {location}, "
+                                    "pick one from the suggestions to be exact.")
+        return location
+
+    def on_weather_click(self):
+        location = self.selected_location()
+        if location is None:
             return
             
         self.weather_button.setEnabled(False)
         self.weather_button.setText("Fetching...")
         self.console.append(f"Fetching weather for {location}...\n")
 
-        #Create and start the weather thread
-
-        self.weather_thread = WeatherThread(location)
-        self.weather_thread.weathercompleted.connect(self.show_weather)
-        self.weather_thread.start()
-        self.weather_thread.finished.connect(self.on_weather_finished)
+        # Run on the shared pool, a second click for the same city joins the first
+        key = ("weather", weather_cache.normalize_location(location))
+        self.workers.submit(key, fetch_weather_job, location, self.weather_cache,
+                            on_progress=self.show_weather, on_result=self.on_weather_result)
 
+    def on_weather_result(self, weather_data, error):
+        if error is not None:
+            weather_data = {"error": str(error)}
+        self.show_weather(weather_data)
+        self.on_weather_finished()
 
     def show_weather(self, weather_data):
         if "error" in weather_data:
             self.console.append(f"Error: {weather_data['error']}\n")
         else:
+            if weather_data.get("stale"):
+                self.console.append("(Cached result, refreshing in the background...)")
             self.console.append(f"Weather in {weather_data['location']}:\n")
             self.console.append(f"Temperature: {weather_data['temperature']} °C\n")
             self.console.append(f"Description: {weather_data['description']}\n")
@@ -442,13 +628,180 @@ class MainWindow(QtWidgets.QMainWindow):
         self.weather_button.setEnabled(True)
         self.weather_button.setText("Get Weather")
 
+    @property
+    def forecast_cache(self):
+        # Parsed forecast series are kept in memory, OpenWeather updates them every 3h
+        if self._forecast_cache is None:
+            import forecast
+            self._forecast_cache = weather_cache.WeatherCache(fetch=forecast.get_forecast_series,
+                                                              ttl=1800, max_entries=32)
+        return self._forecast_cache
+
+    def on_forecast_click(self):
+        location = self.selected_location()
+        if location is None:
+            return
+
+        self.forecast_button.setEnabled(False)
+        self.forecast_button.setText("Fetching...")
+        self.console.append(f"Fetching forecast for {location}...\n")
+
+        key = ("forecast", weather_cache.normalize_location(location))
+        self.workers.submit(key, fetch_forecast_job, location, self.forecast_cache,
+                            on_progress=self.show_forecast, on_result=self.on_forecast_result)
+
+    def on_forecast_result(self, series, error):
+        if error is not None:
+            series = {"error": str(error)}
+        self.show_forecast(series)
+        self.on_forecast_finished()
+
+    def show_forecast(self, series):
+        if isinstance(series, dict):
+            self.console.append(f"Error: {series['error']}\n")
+            return
+        self.forecast_series = series
+        self.console.append(f"Forecast for {series.location}: {len(series)} steps\n")
+        self.render_forecast()
+
+    def render_forecast(self):
+        series = self.forecast_series
+        if series is None:
+            return
+        if self.forecast_view.currentIndex() == 0:
+            headers = ["Day", "Min °C", "Max °C", "Mean °C", "Humidity %", "Max wind m/s", "Rain mm"]
+            rows = [[r["date"], f"{r['temp_min']:.1f}", f"{r['temp_max']:.1f}",
+                     f"{r['temp_mean']:.1f}", f"{r['humidity_mean']:.0f}",
+                     f"{r['wind_max']:.1f}", f"{r['precipitation']:.1f}"]
+                    for r in series.daily_rows()]
+        else:
+            headers = ["Time", "°C", "Humidity %", "Wind m/s", "Rain mm", "Description"]
+            rows = [[r["time"], f"{r['temperature']:.1f}", f"{r['humidity']:.0f}",
+                     f"{r['wind_speed']:.1f}", f"{r['precipitation']:.1f}", r["description"]]
+                    for r in series.step_rows()]
+
+        table = self.forecast_table
+        table.setUpdatesEnabled(False)
+        table.clear()
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                table.setItem(row, column, QtWidgets.QTableWidgetItem(value))
+        table.setUpdatesEnabled(True)
+
+    def on_forecast_finished(self):
+        self.forecast_button.setEnabled(True)
+        self.forecast_button.setText("Get Forecast")
+
+    def load_watchlist(self):
+        # Saved as JSON: gazetteer cities keep their id, free text stays text
+        try:
+            entries = json.loads(self.settings.value("weather/watchlist", "[]"))
+        except ValueError:
+            entries = []
+        return [gazetteer.City(**entry) if isinstance(entry, dict) else entry
+                for entry in entries]
+
+    def save_watchlist(self):
+        entries = [vars(location) if isinstance(location, gazetteer.City) else location
+                   for location in self.watchlist]
+        self.settings.setValue("weather/watchlist", json.dumps(entries))
+
+    def fill_watchlist_table(self):
+        self.watchlist_table.setRowCount(len(self.watchlist))
+        for row, location in enumerate(self.watchlist):
+            self.watchlist_table.setItem(row, 0, QtWidgets.QTableWidgetItem(str(location)))
+            for column in range(1, 6):
+                self.watchlist_table.setItem(row, column, QtWidgets.QTableWidgetItem(""))
+
+    def on_add_to_watchlist(self):
+        location = self.selected_location()
+        if location is None or location in self.watchlist:
+            return
+        self.watchlist.append(location)
+        self.save_watchlist()
+        self.fill_watchlist_table()
+
+    def on_remove_from_watchlist(self):
+        rows = sorted({index.row() for index in self.watchlist_table.selectedIndexes()},
+                      reverse=True)
+        for row in rows:
+            del self.watchlist[row]
+        self.save_watchlist()
+        self.fill_watchlist_table()
+
+    def on_refresh_watchlist(self):
+        if not self.watchlist:
+            self.console.append("The watchlist is empty, add a city first.\n")
+            return
+        self.refresh_watch_btn.setEnabled(False)
+        self.refresh_watch_btn.setText("Refreshing...")
+        for row in range(len(self.watchlist)):
+            self.watchlist_table.item(row, 5).setText("Fetching...")
+
+        self.workers.submit(("watchlist",), refresh_watchlist_job, list(self.watchlist),
+                            self.weather_cache, on_progress=self.show_watchlist_result,
+                            on_result=self.on_watchlist_finished)
+
+    def show_watchlist_result(self, result):
+        row, data = result
+        # Rows fill in one by one as each request comes back
+        if row >= self.watchlist_table.rowCount():
+            return
+        if "error" in data:
+            values = ["", "", "", "", data["error"]]
+        else:
+            values = [f"{data['temperature']:.1f}", data["description"],
+                      f"{data['humidity']}", f"{data['wind_speed']}", "OK"]
+        for column, value in enumerate(values, start=1):
+            self.watchlist_table.item(row, column).setText(value)
+
+    def on_watchlist_finished(self, result=None, error=None):
+        if error is not None:
+            self.console.append(f"Error refreshing watchlist: {error}\n")
+        self.refresh_watch_btn.setEnabled(True)
+        self.refresh_watch_btn.setText("Refresh Watchlist")
+
+    def closeEvent(self, event):
+        # Stop background work and flush pending history rows before exiting
+        self.scheduler.stop()
+        # Weather requests waiting for quota would hold the workers for up to a minute
+        weather.QUOTA.close()
+        self.workers.shutdown()
+        # A running test winds down within about a second once cancelled
+        self.speed_thread.cancel()
+        self.speed_thread.wait(3000)
+        if self._speedtest_worker is not None:
+            self._speedtest_worker.close()
+        self.settings.setValue("weather/quota_state", json.dumps(weather.QUOTA.state()))
+        self.history.close()
+        super().closeEvent(event)
+
 ###########DARK/LIHT MODE TOGGLE##############
     def toggle_theme(self):
-        self.is_dark_mode = not self.is_dark_mode
-        if self.is_dark_mode:
-            self.setStyleSheet(self.dark_theme)
-        else:
-            self.setStyleSheet(self.light_theme)
+        self.apply_theme("light" if self.theme == "dark" else "dark")
+        self.settings.setValue("appearance/theme", self.theme)
+
+    def apply_theme(self, name):
+        """Switch to a theme: one palette change plus the gauges' own colours"""
+        started = time.perf_counter()
+        self.theme = themes.theme_name(name)
+        QtWidgets.QApplication.setPalette(themes.palette(self.theme))
+
+        # Gauges draw their own colours so tell them about the switch
+        if self.pages[self.SPEED_PAGE] is not None:
+            self.download_gauge.setTheme(self.theme)
+            self.upload_gauge.setTheme(self.theme)
+            self.history_chart.setTheme(self.theme)
+        if self.pages[self.SETTINGS_PAGE] is not None:
+            self.theme_toggle.setText(self.theme_toggle_text())
+        self.last_theme_switch_ms = (time.perf_counter() - started) * 1000
+        log.debug("Theme switched to %s in %.2f ms", self.theme, self.last_theme_switch_ms)
+
+    def theme_toggle_text(self):
+        return "Switch to Light Mode" if self.theme == "dark" else "Switch to Dark Mode"
 
 
 ################SETTINGS PAGE##############
@@ -457,43 +810,382 @@ class MainWindow(QtWidgets.QMainWindow):
         layout = QtWidgets.QVBoxLayout()
         
         label = QtWidgets.QLabel("Settings")
-        label.setStyleSheet("font-size: 20px; font-weight: bold;")
+        label.setFont(themes.heading_font(label, 20))
         
         # Theme toggle
         theme_label = QtWidgets.QLabel("Appearance:")
-        theme_toggle = QtWidgets.QPushButton("Switch to Light Mode" if self.is_dark_mode else "Switch to Dark Mode")
-        theme_toggle.clicked.connect(self.toggle_theme)
+        self.theme_toggle = QtWidgets.QPushButton(self.theme_toggle_text())
+        self.theme_toggle.clicked.connect(self.toggle_theme)
+        
+        # Scheduled speed tests
+        schedule_label = QtWidgets.QLabel("Scheduled speed tests:")
+        self.schedule_checkbox = QtWidgets.QCheckBox("Run speed tests automatically")
+
+        self.schedule_interval = QtWidgets.QSpinBox()
+        self.schedule_interval.setRange(1, 24 * 60)
+        self.schedule_interval.setSuffix(" min")
+        self.schedule_interval.setValue(self.scheduler.interval_minutes)
+
+        self.schedule_jitter = QtWidgets.QSpinBox()
+        self.schedule_jitter.setRange(0, 50)
+        self.schedule_jitter.setSuffix(" % jitter")
+        self.schedule_jitter.setValue(int(self.scheduler.jitter * 100))
+
+        self.schedule_status = QtWidgets.QLabel(self.scheduler.status)
+
+        # Log level, applies straight away
+        log_label = QtWidgets.QLabel("Log level:")
+        self.log_level = QtWidgets.QComboBox()
+        self.log_level.addItems(log_console.LEVELS)
+        self.log_level.setCurrentText(logging.getLevelName(logging.getLogger().getEffectiveLevel()))
+        self.log_level.currentTextChanged.connect(self.on_log_level_changed)
+        self.scheduler.statusChanged.connect(self.schedule_status.setText)
+
+        # Parallel speed testing, used from the next run on
+        parallel_label = QtWidgets.QLabel("Parallel speed testing:")
+        self.speedtest_threads = QtWidgets.QSpinBox()
+        self.speedtest_threads.setRange(0, 32)
+        self.speedtest_threads.setSpecialValueText("auto")
+        self.speedtest_threads.setSuffix(" connections per server")
+        self.speedtest_threads.setValue(int(self.settings.value("speedtest/threads", 0)))
+
+        self.speedtest_servers = QtWidgets.QSpinBox()
+        self.speedtest_servers.setRange(1, 8)
+        self.speedtest_servers.setSuffix(" server(s) at once")
+        self.speedtest_servers.setValue(int(self.settings.value("speedtest/servers", 1)))
+
+        self.speedtest_sources = QtWidgets.QLineEdit(self.settings.value("speedtest/sources", ""))
+        self.speedtest_sources.setPlaceholderText("Bind to: interfaces or addresses, comma separated (e.g. eth0, wlan0)")
+
+        self.speedtest_threads.valueChanged.connect(self.on_speedtest_options_changed)
+        self.speedtest_servers.valueChanged.connect(self.on_speedtest_options_changed)
+        self.speedtest_sources.editingFinished.connect(self.on_speedtest_options_changed)
+
+        self.out_of_process_checkbox = QtWidgets.QCheckBox(
+            "Run speed tests in a separate process (smoother gauges, higher ceiling on fast links)")
+        self.out_of_process_checkbox.setChecked(self.settings.value("speedtest/out_of_process", False, type=bool))
+        self.out_of_process_checkbox.toggled.connect(self.on_out_of_process_toggled)
+
+        # OpenWeather key limits, requests queue (user lookups first) to stay under them
+        quota_label = QtWidgets.QLabel("Weather API limits:")
+        self.quota_per_minute = QtWidgets.QSpinBox()
+        self.quota_per_minute.setRange(0, 100000)
+        self.quota_per_minute.setSpecialValueText("no limit")
+        self.quota_per_minute.setSuffix(" per minute")
+        self.quota_per_minute.setValue(weather.PER_MINUTE or 0)
+        self.quota_per_day = QtWidgets.QSpinBox()
+        self.quota_per_day.setRange(0, 10_000_000)
+        self.quota_per_day.setSpecialValueText("no limit")
+        self.quota_per_day.setSuffix(" per day")
+        self.quota_per_day.setValue(weather.PER_DAY or 0)
+        self.quota_per_minute.valueChanged.connect(self.on_quota_changed)
+        self.quota_per_day.valueChanged.connect(self.on_quota_changed)
+
+        quota_row = QtWidgets.QHBoxLayout()
+        quota_row.addWidget(self.quota_per_minute)
+        quota_row.addWidget(self.quota_per_day)
+        quota_row.addStretch()
+
+        parallel_row = QtWidgets.QHBoxLayout()
+        parallel_row.addWidget(self.speedtest_threads)
+        parallel_row.addWidget(self.speedtest_servers)
+        parallel_row.addStretch()
+
+        schedule_row = QtWidgets.QHBoxLayout()
+        schedule_row.addWidget(QtWidgets.QLabel("Every"))
+        schedule_row.addWidget(self.schedule_interval)
+        schedule_row.addWidget(self.schedule_jitter)
+        schedule_row.addStretch()
+
+        # Connect after the initial values so loading settings doesn't save them back
+        self.schedule_checkbox.setChecked(self.scheduler.isActive())
+        self.schedule_checkbox.toggled.connect(self.on_schedule_changed)
+        self.schedule_interval.valueChanged.connect(self.on_schedule_changed)
+        self.schedule_jitter.valueChanged.connect(self.on_schedule_changed)
         
         layout.addWidget(label)
         layout.addWidget(theme_label)
-        layout.addWidget(theme_toggle)
+        layout.addWidget(self.theme_toggle)
+        layout.addWidget(schedule_label)
+        layout.addWidget(self.schedule_checkbox)
+        layout.addLayout(schedule_row)
+        layout.addWidget(self.schedule_status)
+        layout.addWidget(parallel_label)
+        layout.addLayout(parallel_row)
+        layout.addWidget(self.speedtest_sources)
+        layout.addWidget(self.out_of_process_checkbox)
+        layout.addWidget(quota_label)
+        layout.addLayout(quota_row)
+        layout.addWidget(log_label)
+        layout.addWidget(self.log_level)
         layout.addStretch()
         
         page.setLayout(layout)
         return page
 
+    def on_schedule_changed(self):
+        enabled = self.schedule_checkbox.isChecked()
+        minutes = self.schedule_interval.value()
+        jitter_percent = self.schedule_jitter.value()
+
+        self.settings.setValue("scheduler/enabled", enabled)
+        self.settings.setValue("scheduler/interval_minutes", minutes)
+        self.settings.setValue("scheduler/jitter_percent", jitter_percent)
+
+        self.scheduler.configure(minutes, jitter_percent / 100)
+        if enabled and not self.scheduler.isActive():
+            self.scheduler.start()
+        elif not enabled and self.scheduler.isActive():
+            self.scheduler.stop()
+
+    def on_speedtest_options_changed(self):
+        self.settings.setValue("speedtest/threads", self.speedtest_threads.value())
+        self.settings.setValue("speedtest/servers", self.speedtest_servers.value())
+        self.settings.setValue("speedtest/sources", self.speedtest_sources.text().strip())
+
+    def on_quota_changed(self):
+        per_minute, per_day = self.quota_per_minute.value(), self.quota_per_day.value()
+        self.settings.setValue("weather/per_minute", per_minute)
+        self.settings.setValue("weather/per_day", per_day)
+        weather.configure_quota(per_minute or None, per_day or None)
+
+    def on_out_of_process_toggled(self, enabled):
+        self.settings.setValue("speedtest/out_of_process", enabled)
+        if enabled:
+            self.speedtest_worker()  # spawn now so the next test doesn't wait for it
+        elif self._speedtest_worker is not None and not self.speed_thread.isRunning():
+            self._speedtest_worker.close()
+            self._speedtest_worker = None
+
+    def speedtest_worker(self):
+        # The worker process to use for the next test, or None to run in-process
+        if not self.settings.value("speedtest/out_of_process", False, type=bool):
+            return None
+        if self._speedtest_worker is None:
+            import speedtest_worker
+            self._speedtest_worker = speedtest_worker.SpeedTestWorker()
+            self._speedtest_worker.start()
+        return self._speedtest_worker
+
+    def speedtest_options(self):
+        # SpeedTestSession keyword arguments from the saved settings
+        threads = int(self.settings.value("speedtest/threads", 0))
+        sources = self.settings.value("speedtest/sources", "") or ""
+        return {
+            "threads": threads or None,  # 0 -> speedtest.net's own choice
+            "server_count": int(self.settings.value("speedtest/servers", 1)),
+            "source_addresses": [s.strip() for s in sources.split(",") if s.strip()],
+            "server_cache": self.server_cache,
+            "quick": self.settings.value("speedtest/quick", False, type=bool),
+        }
+
+    def on_log_level_changed(self, level):
+        self.settings.setValue("logging/level", level)
+        log_console.set_level(level)
+
+
+###############DIAGNOSTICS PAGE##############
+    DIAGNOSTICS_COLUMNS = ("count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+    def create_diagnostics_page(self):
+        page = QtWidgets.QWidget()
+        layout = QtWidgets.QVBoxLayout()
 
-class WeatherThread(QtCore.QThread):
-    weathercompleted = QtCore.pyqtSignal(dict) # Signal to emit weather data
+        title = QtWidgets.QLabel("Diagnostics")
+        title.setFont(themes.heading_font(title, 20))
+
+        self.diagnostics_checkbox = QtWidgets.QCheckBox("Record timings (speed test phases, weather requests, jobs, gauge painting)")
+        self.diagnostics_checkbox.setChecked(instrumentation.ENABLED)
+        self.diagnostics_checkbox.toggled.connect(self.on_diagnostics_toggled)
+
+        self.diagnostics_table = QtWidgets.QTableWidget(0, len(self.DIAGNOSTICS_COLUMNS) + 1)
+        self.diagnostics_table.setHorizontalHeaderLabels(
+            ["Span", "Count", "Mean ms", "p50 ms", "p95 ms", "p99 ms", "Max ms"])
+        self.diagnostics_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.diagnostics_table.verticalHeader().setVisible(False)
+        self.diagnostics_table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+
+        refresh_btn = QtWidgets.QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.refresh_diagnostics)
+        reset_btn = QtWidgets.QPushButton("Reset")
+        reset_btn.clicked.connect(self.on_reset_diagnostics)
+        export_btn = QtWidgets.QPushButton("Export JSON...")
+        export_btn.clicked.connect(self.on_export_diagnostics)
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(refresh_btn)
+        buttons.addWidget(reset_btn)
+        buttons.addWidget(export_btn)
+        buttons.addStretch()
+
+        # Refresh once a second, but only while recording and this page is showing
+        self.diagnostics_timer = QtCore.QTimer(self)
+        self.diagnostics_timer.setInterval(1000)
+        self.diagnostics_timer.timeout.connect(self.on_diagnostics_tick)
+        if instrumentation.ENABLED:
+            self.diagnostics_timer.start()
 
-    def __init__(self, location):
-        super().__init__()
-        self.location = location    
+        layout.addWidget(title)
+        layout.addWidget(self.diagnostics_checkbox)
+        layout.addWidget(self.diagnostics_table)
+        layout.addLayout(buttons)
 
-    def run(self):
+        page.setLayout(layout)
+        self.refresh_diagnostics()
+        return page
+
+    def on_diagnostics_toggled(self, enabled):
+        self.settings.setValue("diagnostics/enabled", enabled)
+        instrumentation.enable(enabled)
+        if enabled:
+            self.diagnostics_timer.start()
+        else:
+            self.diagnostics_timer.stop()
+
+    def on_diagnostics_tick(self):
+        if self.stacked_widget.currentIndex() == self.DIAGNOSTICS_PAGE:
+            self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        spans = instrumentation.snapshot()
+        self.diagnostics_table.setRowCount(len(spans))
+        for row, (name, summary) in enumerate(spans.items()):
+            self.diagnostics_table.setItem(row, 0, QtWidgets.QTableWidgetItem(name))
+            for column, key in enumerate(self.DIAGNOSTICS_COLUMNS, start=1):
+                value = summary[key]
+                text = str(value) if key == "count" else f"{value:.2f}"
+                item = QtWidgets.QTableWidgetItem(text)
+                item.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+                self.diagnostics_table.setItem(row, column, item)
+
+    def on_reset_diagnostics(self):
+        instrumentation.reset()
+        self.refresh_diagnostics()
+
+    def on_export_diagnostics(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export timings", "morti_timings.json", "JSON files (*.json)")
+        if not path:
+            return
         try:
-            print(f"Fetching weather for {self.location}...")  # Debug
-            weather_data = weather.get_current_weather(self.location)
-            print(f"Weather data fetched: {weather_data}")  # Debug
-            self.weathercompleted.emit(weather_data)
-        except Exception as e:
-            print(f"Error fetching weather data: {e}")  # See what's failing
-            self.weathercompleted.emit({"error": str(e)})
+            instrumentation.export_json(path)
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, "Export failed", f"Could not write {path}: {e}")
+
+
+#################WORKER POOL JOBS####################
+# Run on MainWindow.workers, results come back on the GUI thread
+
+def fetch_weather_job(job, location, cache):
+    log.debug("Fetching weather for %s...", location)
+    weather_data, state = cache.lookup(location)
+    if state == "stale":
+        # Show the old value straight away, then revalidate below
+        job.report(dict(weather_data, stale=True))
+    if state != "fresh":
+        # On a miss the user is waiting on this one, it goes ahead of
+        # watchlist refreshes. A stale value is already showing, so its
+        # revalidation queues like any other background refresh
+        level = weather.PRIORITY_INTERACTIVE if state == "miss" else weather.PRIORITY_BACKGROUND
+        with weather.priority(level):
+            weather_data = cache.refresh(location)
+    log.debug("Weather data fetched (%s): %s", state, weather_data)
+    return weather_data
+
+
+def fetch_forecast_job(job, location, cache):
+    series, state = cache.lookup(location)
+    if state == "stale":
+        # Same as the weather: show the old series, then revalidate
+        job.report(series)
+    if state != "fresh":
+        level = weather.PRIORITY_INTERACTIVE if state == "miss" else weather.PRIORITY_BACKGROUND
+        with weather.priority(level):
+            series = cache.refresh(location)
+    return series
+
+
+def format_quota(remaining, per_minute, per_day, coalesced=0):
+    # "Weather API: 57/60 this minute, 982/1000 today, 2 queued"
+    parts = []
+    if per_minute:
+        parts.append(f"{remaining['minute']}/{per_minute} this minute")
+    if per_day:
+        parts.append(f"{remaining['day']}/{per_day} today")
+    if remaining["queued"]:
+        parts.append(f"{remaining['queued']} queued")
+    if coalesced:
+        parts.append(f"{coalesced} shared")
+    return "Weather API: " + (", ".join(parts) or "no limits")
+
+
+def format_stream(stream):
+    # One console line per server/interface pair of a parallel run
+    server = stream.server or {}
+    where = f"{server.get('sponsor', '?')} ({server.get('name', '?')})"
+    if stream.source_address:
+        where += f" via {stream.source_address}"
+    if stream.error:
+        return f"{where}: failed ({stream.error})"
+    download = f"{stream.download_mbps:.2f}" if stream.download_mbps is not None else "-"
+    upload = f"{stream.upload_mbps:.2f}" if stream.upload_mbps is not None else "-"
+    return f"{where}: {download} down / {upload} up Mbps"
+
+
+def format_quick(result, phase):
+    # " (95%: 190.2-204.8, converged)" after a quick phase, "" otherwise
+    if phase not in result.stop_reasons:
+        return ""
+    interval = getattr(result, f"{phase}_ci")
+    if interval is None:
+        return f" ({result.stop_reasons[phase]})"
+    low, high = interval
+    return f" (95%: {low:.1f}-{high:.1f}, {result.stop_reasons[phase]})"
+
+
+def load_history_job(job, history):
+    # Every run as (times, download, upload, ping) arrays, NaN where a phase failed
+    history.flush()  # include runs still queued for the writer
+    return history.columns()
+
+
+def refresh_watchlist_job(job, locations, cache):
+    for index, data in weather.iter_many(locations):
+        if job.cancelled:
+            break
+        if "error" not in data:
+            cache.put(locations[index], data)
+        job.report((index, data))
 
 
 if __name__ == "__main__":
     import sys
     app = QtWidgets.QApplication(sys.argv)
+    STARTUP.mark("qapplication")
+
+    # --log-level LEVEL overrides the level saved in the settings page
+    log_level = QtCore.QSettings("Morti", "Morti GUI").value("logging/level", log_console.DEFAULT_LEVEL)
+    if "--log-level" in sys.argv:
+        log_level = sys.argv[sys.argv.index("--log-level") + 1]
+    log_listener = log_console.setup_logging(log_level)
     mainWin = MainWindow()
+    STARTUP.mark("main_window")
+
+    # --startup-report prints import / first paint timings as JSON,
+    # --startup-budget MS also quits after the first paint and exits 1 if over budget
+    if "--startup-report" in sys.argv or "--startup-budget" in sys.argv:
+        from startup_timing import watch_first_paint
+        budget = None
+        if "--startup-budget" in sys.argv:
+            budget = float(sys.argv[sys.argv.index("--startup-budget") + 1])
+
+        def on_first_paint():
+            print(STARTUP.report_json())
+            if budget is not None:
+                app.exit(0 if STARTUP.marks["first_paint"] <= budget else 1)
+
+        watch_first_paint(app, STARTUP, on_first_paint)
+
     mainWin.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    status = app.exec_()
+    log_listener.stop()
+    sys.exit(status)
\ No newline at end of file
@@ -0,0 +1,90 @@
+import collections
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+
+import PyQt5.QtWidgets as QtWidgets
+import PyQt5.QtCore as QtCore
+
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+DEFAULT_LEVEL = "INFO"
+
+
+class LogConsole(QtWidgets.QPlainTextEdit):
+    """Read-only log view that keeps only the last max_lines lines.
+
+    append() can be called from any thread. Messages are queued and
+    written in one batch per flush_ms, so a burst of messages costs one
+    document update instead of one per line, and old lines are dropped
+    by the block limit instead of the document growing forever.
+    """
+
+    _wake = QtCore.pyqtSignal()
+
+    def __init__(self, max_lines=1000, flush_ms=100, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+        self._pending = collections.deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(flush_ms)
+        self._timer.timeout.connect(self.flush)
+        # Emitted from any thread, the timer is started on the GUI thread
+        self._wake.connect(self._timer.start)
+
+    def append(self, text):
+        with self._lock:
+            wake = not self._pending
+            self._pending.append(text)
+        if wake:
+            self._wake.emit()
+
+    def flush(self):
+        """Write every queued message now"""
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+        if batch:
+            self.appendPlainText("\n".join(batch))
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+        super().clear()
+
+
+def level_value(name):
+    """logging level for a name like 'INFO', falling back to the default"""
+    name = str(name).upper()
+    return getattr(logging, name if name in LEVELS else DEFAULT_LEVEL)
+
+
+def setup_logging(level=DEFAULT_LEVEL, stream=None):
+    """Send all logging through a queue to a background writer thread.
+
+    Callers only pay for putting the record on the queue, the formatting
+    and writing to stderr happen on the listener's thread. Returns the
+    QueueListener, stop() it on exit to drain what is left.
+    """
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, output)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    set_level(level)
+    listener.start()
+    return listener
+
+
+def set_level(level):
+    logging.getLogger().setLevel(level_value(level))
@@ -0,0 +1,201 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class QuotaExceeded(Exception):
+    """The request would have to wait longer than the scheduler allows"""
+
+
+class QuotaCancelled(QuotaExceeded):
+    """The wait was called off by cancel() or close()"""
+
+
+class TokenBucket:
+    """capacity requests per period seconds, refilled continuously.
+
+    capacity None means unlimited.
+    """
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity or 0)
+        self.updated = time.time()
+
+    def _refill(self, now):
+        if self.capacity is None:
+            return
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(float(self.capacity), self.tokens + elapsed * self.capacity / self.period)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available"""
+        if self.capacity is None:
+            return 0.0
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.period / self.capacity
+
+    def take(self, now):
+        if self.capacity is not None:
+            self._refill(now)
+            self.tokens -= 1
+
+    def drain(self, now):
+        if self.capacity is not None:
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+
+    def remaining(self, now):
+        if self.capacity is None:
+            return None
+        self._refill(now)
+        return int(self.tokens)
+
+
+class Ticket:
+    """One caller's place in the queue, its priority can be raised while it waits"""
+
+    __slots__ = ("priority", "done")
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.done = False
+
+
+class QuotaScheduler:
+    """Token buckets for per-minute and per-day limits with a priority queue.
+
+    acquire() blocks until a request may go out. Waiting callers are served
+    lowest priority value first (FIFO within a priority). A caller that
+    would wait longer than max_wait gets QuotaExceeded instead, so an empty
+    daily budget fails fast rather than hanging for hours. A waiter can be
+    called off early through its cancel event (see cancel()) or all at once
+    by close(), it then gets QuotaCancelled.
+    """
+
+    def __init__(self, per_minute=60, per_day=1000, max_wait=60.0, name="API"):
+        self.name = name  # for error messages
+        self.max_wait = max_wait
+        self.minute = TokenBucket(per_minute, 60)
+        self.day = TokenBucket(per_day, 24 * 3600)
+        self.granted = 0
+        self.rejected = 0
+        self._queue = []  # (priority, seq, ticket), stale entries skipped
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def configure(self, per_minute, per_day):
+        """New limits; budget already used stays used"""
+        with self._cond:
+            now = time.time()
+            for bucket, capacity in ((self.minute, per_minute), (self.day, per_day)):
+                used = bucket.capacity - bucket.remaining(now) if bucket.capacity else 0
+                bucket.capacity = capacity
+                bucket.tokens = float(max(0, capacity - used)) if capacity else 0.0
+                bucket.updated = now
+            self._cond.notify_all()
+
+    def ticket(self, priority):
+        return Ticket(priority)
+
+    def raise_priority(self, ticket, priority):
+        """Move a waiting ticket up (e.g. the user now wants what a refresh queued)"""
+        with self._cond:
+            if ticket.done or priority >= ticket.priority:
+                return
+            ticket.priority = priority
+            heapq.heappush(self._queue, (priority, next(self._seq), ticket))
+            self._cond.notify_all()
+
+    def _head(self):
+        # Drop entries for tickets that were served, gave up or got re-queued
+        while self._queue and (self._queue[0][2].done or self._queue[0][0] != self._queue[0][2].priority):
+            heapq.heappop(self._queue)
+        return self._queue[0][2] if self._queue else None
+
+    def acquire(self, ticket, cancel=None):
+        """Block until ticket may make its request, or raise QuotaExceeded.
+
+        cancel is an optional threading.Event, set it through cancel() so
+        the wait notices straight away.
+        """
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            heapq.heappush(self._queue, (ticket.priority, next(self._seq), ticket))
+            try:
+                while True:
+                    if self._closed or (cancel is not None and cancel.is_set()):
+                        raise QuotaCancelled(f"{self.name} request cancelled")
+                    now = time.time()
+                    if self._head() is ticket:
+                        wait = max(self.minute.wait_time(now), self.day.wait_time(now))
+                        if wait == 0:
+                            self.minute.take(now)
+                            self.day.take(now)
+                            self.granted += 1
+                            return
+                        if time.monotonic() + wait > deadline:
+                            self.rejected += 1
+                            raise QuotaExceeded(f"{self.name} budget used up, next request in {_format_wait(wait)}")
+                    else:
+                        wait = deadline - time.monotonic()
+                        if wait <= 0:
+                            self.rejected += 1
+                            raise QuotaExceeded(f"{self.name} request queued too long")
+                    self._cond.wait(wait)
+            finally:
+                ticket.done = True
+                self._cond.notify_all()
+
+    def cancel(self, event):
+        """Set a cancel event given to acquire() and wake its waiters"""
+        with self._cond:
+            event.set()
+            self._cond.notify_all()
+
+    def close(self):
+        """Fail every waiting and later acquire() with QuotaCancelled (on exit)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def drain(self):
+        """The server said 429: assume this minute's budget is gone"""
+        with self._cond:
+            self.minute.drain(time.time())
+
+    def remaining(self):
+        """{"minute": n, "day": n, "queued": n}, None for an unlimited bucket"""
+        with self._cond:
+            now = time.time()
+            self._head()
+            queued = len({id(ticket) for _, _, ticket in self._queue if not ticket.done})
+            return {"minute": self.minute.remaining(now), "day": self.day.remaining(now),
+                    "queued": queued}
+
+    def state(self):
+        """Daily budget left, to carry over a restart (see restore())"""
+        with self._cond:
+            return {"day_tokens": self.day.remaining(time.time()), "saved_at": time.time()}
+
+    def restore(self, state):
+        with self._cond:
+            if self.day.capacity is None or state.get("day_tokens") is None:
+                return
+            self.day.tokens = min(float(self.day.capacity), float(state["day_tokens"]))
+            self.day.updated = float(state.get("saved_at", time.time()))
+            self.day._refill(time.time())
+
+
+def _format_wait(seconds):
+    if seconds < 120:
+        return f"{seconds:.0f} s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".morti_gui", "speedtest_servers.json")
+
+
+def network_key(config, source_addresses=()):
+    """What the cached servers depend on: the public IP / ISP speedtest.net
+    sees (from the config every run fetches anyway) and the local bind addresses"""
+    client = config.get("client", {})
+    sources = ",".join(source_addresses)
+    return f"{client.get('ip', '')}|{client.get('isp', '')}|{sources}"
+
+
+class ServerCache:
+    """Ranked speedtest.net servers per network, kept on disk as JSON.
+
+    An entry is the latency-ranked server list from the last full
+    discovery on that network. Entries older than ttl are ignored, so the
+    server list gets refetched at least that often. Only the newest
+    max_entries networks are kept (home, work, phone hotspot...).
+    """
+
+    def __init__(self, path=DEFAULT_PATH, ttl=24 * 3600, max_entries=16):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # network key -> {"saved_at": ..., "servers": [...]}
+        self._rechecking = set()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path:
+            self._load()
+
+    def lookup(self, network):
+        """Ranked servers (best first, with their latency) or None"""
+        with self._lock:
+            entry = self._entries.get(network)
+            if entry is None or time.time() - entry["saved_at"] > self.ttl:
+                return None
+            return [dict(server) for server in entry["servers"]]
+
+    def store(self, network, servers):
+        with self._lock:
+            self._entries[network] = {"saved_at": time.time(),
+                                      "servers": [dict(server) for server in servers]}
+            # Drop the networks not seen for longest
+            newest = sorted(self._entries.items(), key=lambda item: item[1]["saved_at"])
+            self._entries = dict(newest[-self.max_entries:])
+            snapshot = dict(self._entries)
+        if self.path:
+            self._save(snapshot)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            self._save({})
+
+    def begin_recheck(self, network):
+        """True if the caller should re-rank this network (one at a time)"""
+        with self._lock:
+            if network in self._rechecking:
+                return False
+            self._rechecking.add(network)
+            return True
+
+    def end_recheck(self, network):
+        with self._lock:
+            self._rechecking.discard(network)
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(entries, dict):
+            self._entries = entries
+
+    def _save(self, entries):
+        # Same temp file + swap as the weather cache
+        try:
+            with self._save_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning("Could not save speedtest server cache: %s", e)
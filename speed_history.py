@@ -0,0 +1,212 @@
+import logging
+import os
+import queue
+import socket
+import sqlite3
+import threading
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".morti_gui", "speed_history.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    host TEXT,
+    download_mbps REAL,
+    upload_mbps REAL,
+    ping_ms REAL,
+    bytes_received INTEGER,
+    bytes_sent INTEGER,
+    server_id TEXT,
+    server_name TEXT,
+    server_host TEXT,
+    discovery_s REAL,
+    download_s REAL,
+    upload_s REAL,
+    error TEXT,
+    failed_phase TEXT
+);
+-- Covering index so time range / bucket queries never touch the table
+CREATE INDEX IF NOT EXISTS runs_by_time
+    ON runs (started_at, download_mbps, upload_mbps, ping_ms);
+"""
+
+INSERT = """
+INSERT INTO runs (started_at, finished_at, host, download_mbps, upload_mbps,
+                  ping_ms, bytes_received, bytes_sent, server_id, server_name,
+                  server_host, discovery_s, download_s, upload_s, error,
+                  failed_phase)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_STOP = object()
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def result_row(result, host=None):
+    """Flatten a speedtest_logger.SpeedTestResult into an INSERT row"""
+    server = result.server or {}
+    timings = result.timings or {}
+    return (
+        result.started_at, result.finished_at, host or socket.gethostname(),
+        result.download_mbps, result.upload_mbps, result.ping_ms,
+        result.bytes_received, result.bytes_sent,
+        str(server.get("id", "")) or None, server.get("sponsor"), server.get("host"),
+        timings.get("discovery"), timings.get("download"), timings.get("upload"),
+        result.error, result.failed_phase,
+    )
+
+
+def chart_sample(result):
+    """(started_at, download, upload, ping) as the chart shows a run.
+
+    The phase that failed (or timed out) only measured part of a transfer,
+    so its value is left out.
+    """
+    values = {"discovery": result.ping_ms, "download": result.download_mbps,
+              "upload": result.upload_mbps}
+    if result.failed_phase in values:
+        values[result.failed_phase] = None
+    return result.started_at, values["download"], values["upload"], values["discovery"]
+
+
+class HistoryStore:
+    """SQLite (WAL) store of every speed test run.
+
+    record() only puts the row on a queue; a background writer thread
+    commits rows in batches so callers never wait on disk.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, batch_size=200, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._write_conn = _connect(path)
+        self._write_conn.executescript(SCHEMA)
+        self._write_conn.commit()
+        # Reads get their own connection, WAL lets them run beside the writer
+        self._read_conn = _connect(path)
+        self._read_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer",
+                                        daemon=True)
+        self._writer.start()
+
+    def record(self, result, host=None):
+        """Queue a SpeedTestResult for writing (never blocks)"""
+        self._queue.put(result_row(result, host))
+
+    def record_rows(self, rows):
+        """Queue pre-built INSERT rows, used for bulk imports"""
+        for row in rows:
+            self._queue.put(row)
+
+    def flush(self):
+        """Block until everything queued so far is on disk"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._read_conn.close()
+        self._write_conn.close()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Gather whatever else arrives within the flush window
+            try:
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+
+            rows = [row for row in batch if row is not _STOP]
+            try:
+                if rows:
+                    with self._write_conn:
+                        self._write_conn.executemany(INSERT, rows)
+            except sqlite3.Error as e:
+                log.error("History write failed: %s", e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is _STOP:
+                return
+
+    def _query(self, sql, params=()):
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def count(self):
+        return self._query("SELECT COUNT(*) FROM runs")[0][0]
+
+    def recent(self, limit=20):
+        """Most recent runs, newest first, as (started_at, down, up, ping) rows"""
+        return self._query(
+            "SELECT started_at, download_mbps, upload_mbps, ping_ms FROM runs "
+            "ORDER BY started_at DESC LIMIT ?", (limit,))
+
+    def between(self, start, end):
+        """Runs with start <= started_at < end, oldest first"""
+        return self._query(
+            "SELECT started_at, download_mbps, upload_mbps, ping_ms FROM runs "
+            "WHERE started_at >= ? AND started_at < ? ORDER BY started_at",
+            (start, end))
+
+    def columns(self, start=0, end=float("inf")):
+        """Chart data: (times, download, upload, ping) float arrays, NaN where
+        a phase failed (same as chart_sample()). Cancelled runs are left out.
+
+        Rows go from the cursor straight into one preallocated numpy array,
+        so loading years of runs never builds a list of tuples.
+        """
+        import numpy as np  # only the history chart needs this
+
+        dtype = [("started_at", "f8"), ("download", "f8"), ("upload", "f8"), ("ping", "f8")]
+        where = ("WHERE started_at >= ? AND started_at < ? "
+                 "AND (error IS NULL OR error != 'Cancelled')")
+        with self._read_lock:
+            # One read transaction, so the count matches the rows that follow
+            self._read_conn.execute("BEGIN")
+            try:
+                count = self._read_conn.execute(
+                    f"SELECT COUNT(*) FROM runs {where}", (start, end)).fetchone()[0]
+                cursor = self._read_conn.execute(
+                    "SELECT started_at, "
+                    "CASE WHEN failed_phase = 'download' THEN NULL ELSE download_mbps END, "
+                    "CASE WHEN failed_phase = 'upload' THEN NULL ELSE upload_mbps END, "
+                    "CASE WHEN failed_phase = 'discovery' THEN NULL ELSE ping_ms END "
+                    f"FROM runs {where} ORDER BY started_at", (start, end))
+                data = np.fromiter(cursor, dtype=dtype, count=count)
+            finally:
+                self._read_conn.execute("COMMIT")
+        return data["started_at"], data["download"], data["upload"], data["ping"]
+
+    def buckets(self, start, end, bucket_seconds=3600):
+        """Aggregate runs into fixed time buckets (e.g. hourly over 30 days).
+
+        Returns (bucket_start, runs, avg_down, min_down, max_down, avg_up,
+        avg_ping) rows. The covering time index keeps this an index-only scan.
+        """
+        return self._query(
+            "SELECT CAST(started_at / ? AS INTEGER) * ? AS bucket, COUNT(*), "
+            "AVG(download_mbps), MIN(download_mbps), MAX(download_mbps), "
+            "AVG(upload_mbps), AVG(ping_ms) FROM runs "
+            "WHERE started_at >= ? AND started_at < ? "
+            "GROUP BY bucket ORDER BY bucket",
+            (bucket_seconds, bucket_seconds, start, end))
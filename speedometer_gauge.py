@@ -3,52 +3,238 @@ import PyQt5.QtCore as QtCore
 import PyQt5.QtGui as QtGui
 import math
 
+import instrumentation
+import themes
+
+
+class GaugeAnimator(QtCore.QObject):
+    """Shared frame clock that eases every animating gauge toward its target.
+
+    One timer drives all gauges and it only runs while at least one gauge
+    is moving or has a pending repaint, so an idle window costs nothing.
+    """
+
+    FPS = 60
+    _instance = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._gauges = set()
+        self._clock = QtCore.QElapsedTimer()
+        self._timer = QtCore.QTimer(self)
+        self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._timer.setInterval(int(1000 / self.FPS))
+        self._timer.timeout.connect(self._tick)
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(QtWidgets.QApplication.instance())
+        return cls._instance
+
+    def register(self, gauge):
+        """Schedule a gauge for the next frame (starts the clock if idle)"""
+        self._gauges.add(gauge)
+        if not self._timer.isActive():
+            self._clock.start()
+            self._timer.start()
+
+    def isActive(self):
+        return self._timer.isActive()
+
+    def _tick(self):
+        dt = self._clock.restart() / 1000.0
+        for gauge in list(self._gauges):
+            try:
+                moving = gauge._advance(dt)
+            except RuntimeError:
+                # Underlying widget was deleted while it was animating
+                moving = False
+            if not moving:
+                self._gauges.discard(gauge)
+        if not self._gauges:
+            self._timer.stop()
+
 
 class SpeedometerGauge(QtWidgets.QWidget):
     """Custom circular speedometer gauge widget"""
-    
+
     def __init__(self, max_value=500, label="SPEED", parent=None):
         super().__init__(parent)
         self.max_value = max_value
+        self.base_max_value = max_value
+        self.auto_scale = False  # grow max_value when a value goes past it
         self.current_value = 0
+        self.target_value = 0
         self.label = label
+        self.theme = "dark"
         self.setMinimumSize(250, 250)
-        
+
+        # Pre-rendered dial (everything except the needle and readout)
+        self._static_cache = None
+        self._static_key = None
+
+        # Animation state, repaints are batched until the next frame tick
+        self.ease_time = 0.15  # seconds for the needle to cover ~63% of a move
+        self._pending_region = None
+
     def setValue(self, value):
-        """Set the current value of the gauge"""
-        self.current_value = max(0, min(value, self.max_value))
-        self.update()
-    
+        """Jump the needle straight to a value (repainted on the next frame)"""
+        self._fit_scale(value)
+        value = max(0, min(value, self.max_value))
+        self.target_value = value
+        if value == self.current_value:
+            return
+        self._move_needle(value)
+        GaugeAnimator.instance().register(self)
+
+    def setTargetValue(self, value):
+        """Ease the needle toward a value using the shared animation clock"""
+        self._fit_scale(value)
+        value = max(0, min(value, self.max_value))
+        if value == self.target_value:
+            return
+        self.target_value = value
+        GaugeAnimator.instance().register(self)
+
     def value(self):
         """Get the current value"""
         return self.current_value
-    
-    def paintEvent(self, event):
-        """Custom paint event to draw the speedometer"""
-        painter = QtGui.QPainter(self)
-        painter.setRenderHint(QtGui.QPainter.Antialiasing)
-        
-        # Get widget dimensions
+
+    def _move_needle(self, value):
+        old_value = self.current_value
+        self.current_value = value
+        # Only repaint around the old and new needle plus the readout
+        region = self._dirty_region(old_value, value)
+        if self._pending_region is None:
+            self._pending_region = region
+        else:
+            self._pending_region = self._pending_region.united(region)
+
+    def _advance(self, dt):
+        """Step the animation by dt seconds, return True while still moving"""
+        if self.current_value != self.target_value:
+            diff = self.target_value - self.current_value
+            step = diff * (1 - math.exp(-dt / self.ease_time))
+            if abs(diff - step) < self.max_value * 0.001:
+                new_value = self.target_value
+            else:
+                new_value = self.current_value + step
+            self._move_needle(new_value)
+
+        # Flush everything that changed since the last frame in one update
+        if self._pending_region is not None:
+            self.update(self._pending_region)
+            self._pending_region = None
+        return self.current_value != self.target_value
+
+    def setMaxValue(self, max_value):
+        """Change the top of the scale (rebuilds the dial)"""
+        if max_value == self.max_value:
+            return
+        self.max_value = max_value
+        self.current_value = min(self.current_value, max_value)
+        self.target_value = min(self.target_value, max_value)
+        self.update()
+
+    def setAutoScale(self, enabled):
+        """Let values past max_value raise it to the next 1 / 2.5 / 5 step"""
+        self.auto_scale = enabled
+
+    def resetScale(self):
+        """Go back to the max_value the gauge was created with"""
+        self.setMaxValue(self.base_max_value)
+
+    def _fit_scale(self, value):
+        if self.auto_scale and value > self.max_value:
+            self.setMaxValue(nice_scale(value))
+
+    def setLabel(self, label):
+        """Change the gauge label (rebuilds the dial)"""
+        if label == self.label:
+            return
+        self.label = label
+        self.update()
+
+    def setTheme(self, theme):
+        """Switch the gauge colours to the given theme name"""
+        if theme == self.theme:
+            return
+        self.theme = theme
+        self.update()
+
+    def _geometry(self):
+        """Return the centre point and radius of the dial"""
         width = self.width()
         height = self.height()
         size = min(width, height)
-        
-        # Center point
-        center_x = width / 2
-        center_y = height / 2
-        radius = size * 0.4
-        
+        return width / 2, height / 2, size * 0.4
+
+    def _needle_tip(self, value):
+        center_x, center_y, radius = self._geometry()
+        value_angle = -45 + (270 * value / self.max_value)
+        needle_rad = math.radians(value_angle)
+        needle_length = radius * 0.8
+        return (center_x + needle_length * math.cos(needle_rad),
+                center_y + needle_length * math.sin(needle_rad))
+
+    def _needle_rect(self, value):
+        """Bounding rect of the needle and pivot for a value"""
+        center_x, center_y, _ = self._geometry()
+        tip_x, tip_y = self._needle_tip(value)
+        rect = QtCore.QRectF(QtCore.QPointF(center_x, center_y),
+                             QtCore.QPointF(tip_x, tip_y)).normalized()
+        # Grow by the pivot radius plus pen width so antialiasing is covered
+        return rect.adjusted(-12, -12, 12, 12)
+
+    def _readout_rect(self):
+        _, center_y, _ = self._geometry()
+        return QtCore.QRectF(0, center_y - 20, self.width(), 40)
+
+    def _dirty_region(self, old_value, new_value):
+        region = QtGui.QRegion(self._needle_rect(old_value).toAlignedRect())
+        region = region.united(self._needle_rect(new_value).toAlignedRect())
+        return region.united(self._readout_rect().toAlignedRect())
+
+    def _static_cache_key(self):
+        return (self.width(), self.height(), self.devicePixelRatioF(),
+                self.max_value, self.label, self.theme)
+
+    def _static_layer(self):
+        """Return the cached dial pixmap, rebuilding it only when needed"""
+        key = self._static_cache_key()
+        if self._static_cache is None or key != self._static_key:
+            with instrumentation.span("gauge.static_layer"):
+                self._static_cache = self._render_static_layer()
+            self._static_key = key
+        return self._static_cache
+
+    def _render_static_layer(self):
+        """Draw background, ticks, labels and the coloured arc once"""
+        dpr = self.devicePixelRatioF()
+        pixmap = QtGui.QPixmap(max(1, int(self.width() * dpr)),
+                               max(1, int(self.height() * dpr)))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(QtCore.Qt.transparent)
+
+        colours = themes.tokens(self.theme)
+        painter = QtGui.QPainter(pixmap)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+
+        width = self.width()
+        center_x, center_y, radius = self._geometry()
+
         # Draw outer circle (gauge background)
-        painter.setPen(QtGui.QPen(QtGui.QColor("#3a3a3a"), 3))
-        painter.setBrush(QtGui.QColor("#252525"))
+        painter.setPen(QtGui.QPen(QtGui.QColor(colours["border"]), 3))
+        painter.setBrush(QtGui.QColor(colours["base"]))
         painter.drawEllipse(QtCore.QPointF(center_x, center_y), radius, radius)
-        
+
         # Draw tick marks and value labels
-        painter.setPen(QtGui.QPen(QtGui.QColor("#ffffff"), 2))
+        painter.setPen(QtGui.QPen(QtGui.QColor(colours["text"]), 2))
         for i in range(0, 11):  # 0 to max_value in 10 steps
             angle = -45 + (270 * i / 10)  # Start at -45° (top-right), sweep 270° to 225° (top-left)
             rad = math.radians(angle)
-            
+
             # Draw tick marks
             inner_radius = radius * 0.85
             outer_radius = radius * 0.95
@@ -57,21 +243,23 @@ class SpeedometerGauge(QtWidgets.QWidget):
             x2 = center_x + outer_radius * math.cos(rad)
             y2 = center_y + outer_radius * math.sin(rad)
             painter.drawLine(QtCore.QPointF(x1, y1), QtCore.QPointF(x2, y2))
-            
+
             # Draw value labels
-            label_value = int(self.max_value * i / 10)
+            label_value = _scale_label(self.max_value * i / 10)
             label_radius = radius * 0.7
             label_x = center_x + label_radius * math.cos(rad)
             label_y = center_y + label_radius * math.sin(rad)
             painter.drawText(QtCore.QRectF(label_x - 20, label_y - 10, 40, 20),
-                           QtCore.Qt.AlignCenter, str(label_value))
-        
+                           QtCore.Qt.AlignCenter, label_value)
+
         # Draw colored arc (speed range indicator)
         # Arc spans from 135° to 405° (270° total)
         painter.setPen(QtCore.Qt.NoPen)
-        
+
         # Draw arc in segments with gradient colors
         num_segments = 100
+        arc_rect = QtCore.QRectF(center_x - radius * 0.9, center_y - radius * 0.9,
+                                  radius * 1.8, radius * 1.8)
         for i in range(num_segments):
             # Calculate color based on position
             ratio = i / num_segments
@@ -99,40 +287,72 @@ class SpeedometerGauge(QtWidgets.QWidget):
                     int(143 - (143 * local_ratio)),
                     0
                 )
-            
+
             painter.setPen(QtGui.QPen(color, 8))
             start_angle = (-45 + (270 * i / num_segments)) * 16
             span_angle = (270 / num_segments) * 16
-            arc_rect = QtCore.QRectF(center_x - radius * 0.9, center_y - radius * 0.9,
-                                      radius * 1.8, radius * 1.8)
             painter.drawArc(arc_rect, int(start_angle), int(span_angle))
-        
-        # Draw needle
-        value_angle = -45 + (270 * self.current_value / self.max_value)
-        needle_rad = math.radians(value_angle)
-        needle_length = radius * 0.8
-        needle_x = center_x + needle_length * math.cos(needle_rad)
-        needle_y = center_y + needle_length * math.sin(needle_rad)
-        
-        painter.setPen(QtGui.QPen(QtGui.QColor("#ff0000"), 3))
-        painter.drawLine(QtCore.QPointF(center_x, center_y),
-                        QtCore.QPointF(needle_x, needle_y))
-        
-        # Draw center circle (needle pivot)
-        painter.setBrush(QtGui.QColor("#ff0000"))
-        painter.drawEllipse(QtCore.QPointF(center_x, center_y), 8, 8)
-        
+
         # Draw gauge label
-        painter.setPen(QtGui.QColor("#ffffff"))
+        painter.setPen(QtGui.QColor(colours["text"]))
         font = painter.font()
         font.setPointSize(12)
         font.setBold(True)
         painter.setFont(font)
         painter.drawText(QtCore.QRectF(0, center_y - radius * 0.7, width, 30),
                         QtCore.Qt.AlignCenter, self.label)
-        
+
+        painter.end()
+        return pixmap
+
+    def paintEvent(self, event):
+        """Custom paint event to draw the speedometer"""
+        with instrumentation.span("gauge.paint"):
+            self._paint()
+
+    def _paint(self):
+        painter = QtGui.QPainter(self)
+
+        # Static dial comes from the cache, only the needle is drawn live
+        painter.drawPixmap(0, 0, self._static_layer())
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+
+        colours = themes.tokens(self.theme)
+        width = self.width()
+        center_x, center_y, radius = self._geometry()
+
+        # Draw needle
+        needle_x, needle_y = self._needle_tip(self.current_value)
+
+        painter.setPen(QtGui.QPen(QtGui.QColor(colours["needle"]), 3))
+        painter.drawLine(QtCore.QPointF(center_x, center_y),
+                        QtCore.QPointF(needle_x, needle_y))
+
+        # Draw center circle (needle pivot)
+        painter.setBrush(QtGui.QColor(colours["needle"]))
+        painter.drawEllipse(QtCore.QPointF(center_x, center_y), 8, 8)
+
         # Draw current value text
+        painter.setPen(QtGui.QColor(colours["text"]))
+        font = painter.font()
         font.setPointSize(16)
+        font.setBold(True)
         painter.setFont(font)
         painter.drawText(QtCore.QRectF(0, center_y - 20, width, 40),
                         QtCore.Qt.AlignCenter, f"{self.current_value:.1f}")
+
+
+def nice_scale(value):
+    """Smallest 1, 2.5 or 5 times a power of ten that is >= value"""
+    magnitude = 10 ** math.floor(math.log10(value))
+    for multiple in (1, 2.5, 5, 10):
+        if value <= multiple * magnitude:
+            scale = multiple * magnitude
+            return int(scale) if scale == int(scale) else scale
+
+
+def _scale_label(value):
+    # Keep tick labels short enough for the dial once the scale grows
+    if value >= 10000:
+        return f"{value / 1000:g}k"
+    return str(int(value))
@@ -1,23 +1,676 @@
-import speedtest
+import copy
+import ipaddress
+import logging
+import math
+import socket
+import statistics
+import struct
+import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.error import URLError
 
-def download():
-    try:
-        st = speedtest.Speedtest(secure=True)
-        st.get_best_server()
-        time.sleep(1)
-        download_speed = st.download() / 1_000_000  # Convert to Mbps
-        return f"Download speed: {download_speed:.2f} Mbps"
-    except Exception as e:
-        return f"Download error: {str(e)}"
+import instrumentation
+from server_cache import network_key
+
+
+log = logging.getLogger(__name__)
+
+# Candidates are latency-probed all at once; whatever hasn't answered by
+# the deadline is dropped instead of holding up the test
+PROBE_CANDIDATES = 10
+PROBE_DEADLINE = 3.0
+# speedtest-cli charges 3600 s per failed probe and divides the sum of 3
+# probes by 6, so a single failure already scores at least this much
+_FAILED_LATENCY_MS = 3600 * 1000 / 6
+# A cached server gets re-ranked (after the test, in the background) when
+# its latency is this much worse than when it was picked
+RECHECK_LATENCY_RATIO = 1.5
+RECHECK_LATENCY_SLACK_MS = 5.0
+# After a cancel or phase timeout the phase gets this long to wind down
+# (so the bytes moved so far are counted) before it is left behind
+ABORT_GRACE = 1.0
+
+
+@dataclass
+class StreamResult:
+    """What one stream (a server, maybe bound to a local address) measured"""
+    server: dict = field(default_factory=dict)
+    source_address: Optional[str] = None
+    download_mbps: Optional[float] = None
+    upload_mbps: Optional[float] = None
+    bytes_received: int = 0
+    bytes_sent: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class SpeedTestResult:
+    """Everything measured during one speed test run.
+
+    Values that were never measured (because a phase failed) stay None
+    rather than defaulting to zero.
+    """
+    download_mbps: Optional[float] = None
+    upload_mbps: Optional[float] = None
+    ping_ms: Optional[float] = None
+    bytes_received: int = 0
+    bytes_sent: int = 0
+    server: dict = field(default_factory=dict)
+    timings: dict = field(default_factory=dict)  # phase name -> seconds
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    failed_phase: Optional[str] = None
+    streams: list = field(default_factory=list)  # StreamResult per server / source address
+    quick: bool = False
+    download_ci: Optional[tuple] = None  # (low, high) Mbps, 95% interval, quick mode only
+    upload_ci: Optional[tuple] = None
+    stop_reasons: dict = field(default_factory=dict)  # phase -> why a quick phase ended
+    cancelled: bool = False  # stopped by SpeedTestSession.cancel(), values so far are kept
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def server_name(self):
+        if not self.server:
+            return ""
+        return f"{self.server.get('sponsor', '')} ({self.server.get('name', '')})"
+
+
+@dataclass
+class ProgressSample:
+    """Live throughput reading taken while a transfer phase is running"""
+    phase: str
+    bytes: int
+    elapsed: float
+    instant_mbps: float
+    smoothed_mbps: float
+
+
+class ThroughputMeter:
+    """Counts bytes moved by the transfer threads and reports samples.
+
+    Sampling and smoothing run on a background thread at a fixed interval,
+    so listeners get at most 1 / interval callbacks per second no matter how
+    fast the bytes arrive.
+    """
+
+    MIN_INTERVAL = 0.05
+
+    def __init__(self, phase, on_sample=None, interval=0.2, smoothing=0.3):
+        self.phase = phase
+        self.on_sample = on_sample
+        self.interval = max(interval, self.MIN_INTERVAL)
+        self.smoothing = smoothing  # EWMA weight of the newest sample
+        self.total_bytes = 0
+        self.smoothed_mbps = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+
+    def add(self, count):
+        with self._lock:
+            self.total_bytes += count
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.on_sample is not None:
+            self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def mbps(self):
+        """Average rate since start()"""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return self.total_bytes * 8 / elapsed / 1_000_000 if elapsed > 0 else 0.0
+
+    def _sample_loop(self):
+        last_bytes = 0
+        last_time = self._started
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            with self._lock:
+                total = self.total_bytes
+            instant = (total - last_bytes) * 8 / (now - last_time) / 1_000_000
+            if self.smoothed_mbps == 0.0:
+                self.smoothed_mbps = instant
+            else:
+                self.smoothed_mbps += self.smoothing * (instant - self.smoothed_mbps)
+            last_bytes, last_time = total, now
+            self.on_sample(ProgressSample(self.phase, total, now - self._started,
+                                          instant, self.smoothed_mbps))
+
+
+class ConvergenceMonitor:
+    """Decides when a quick test phase has seen enough.
+
+    Fed the meter's samples. After warmup seconds (TCP ramp-up) it stops
+    the phase once every smoothed reading of the last window seconds is
+    within +-tolerance of their mean, or as soon as max_bytes or
+    max_seconds is reached, whichever comes first.
+    """
+
+    def __init__(self, tolerance=0.05, window=2.0, warmup=1.0, max_seconds=8.0,
+                 max_bytes=100_000_000):
+        self.tolerance = tolerance
+        self.window = window
+        self.warmup = warmup
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.samples = []  # ProgressSamples after the warm-up
+        self.reason = None  # "converged", "byte cap" or "time cap" once stopped
+
+    def add(self, sample):
+        """Record a sample, True once the phase should stop"""
+        if sample.elapsed >= self.warmup:
+            self.samples.append(sample)
+        if sample.bytes >= self.max_bytes:
+            self.reason = "byte cap"
+        elif sample.elapsed >= self.max_seconds:
+            self.reason = "time cap"
+        else:
+            window = self._window()
+            if window:
+                mean = statistics.fmean(s.smoothed_mbps for s in window)
+                if mean > 0 and all(abs(s.smoothed_mbps - mean) <= self.tolerance * mean
+                                    for s in window):
+                    self.reason = "converged"
+        return self.reason is not None
+
+    def _window(self):
+        # The samples covering the last `window` seconds, None until there are that many
+        if not self.samples or self.samples[-1].elapsed - self.samples[0].elapsed < self.window:
+            return None
+        start = self.samples[-1].elapsed - self.window
+        return [s for s in self.samples if s.elapsed >= start]
+
+    def estimate(self):
+        """(mean Mbps, (low, high)) from the latest window, None without enough samples"""
+        rates = [s.instant_mbps for s in (self._window() or self.samples)]
+        if len(rates) < 2:
+            return None
+        mean = statistics.fmean(rates)
+        half_width = 1.96 * statistics.stdev(rates) / math.sqrt(len(rates))
+        return mean, (max(0.0, mean - half_width), mean + half_width)
+
+
+class _StopEvent(threading.Event):
+    # speedtest-cli polls the old camelCase name, which warns on 3.10+
+    isSet = threading.Event.is_set
+
+
+class _MeteredResponse:
+    """Response wrapper that counts downloaded bytes as they are read"""
+
+    def __init__(self, response, meter):
+        self._response = response
+        self._meter = meter
+
+    def read(self, *args):
+        chunk = self._response.read(*args)
+        if self._meter is not None:
+            self._meter.add(len(chunk))
+        return chunk
+
+    def abort(self):
+        # close() would wait for a read blocked in another thread, shutdown() wakes it
+        sock = getattr(getattr(getattr(self._response, "fp", None), "raw", None), "_sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class _MeteredUpload:
+    """Upload body wrapper that counts bytes as http.client pulls them"""
+
+    def __init__(self, data, opener):
+        self._data = data
+        self._opener = opener
+
+    def read(self, *args):
+        chunk = self._data.read(*args)
+        if self._opener.meter is not None:
+            self._opener.meter.add(len(chunk))
+        return chunk
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getattr__(self, name):
+        return getattr(self._data, name)
+
+
+class _MeteredOpener:
+    """Drop-in for the speedtest client's urllib opener that feeds a meter"""
+
+    def __init__(self, opener):
+        self._opener = opener
+        self.meter = None
+        self.stop = None  # once set, requests the client still queues fail straight away
+        self._responses = weakref.WeakSet()
 
+    def open(self, request, *args, **kwargs):
+        if self.stop is not None and self.stop.is_set():
+            raise URLError("transfer stopped")
+        if request.data is None:
+            with instrumentation.span("speedtest.http_get"):
+                response = self._opener.open(request, *args, **kwargs)
+            response = _MeteredResponse(response, self.meter)
+            self._responses.add(response)
+            return response
+        if not isinstance(request.data, _MeteredUpload):
+            # Swapping data drops Content-length, so put it back afterwards
+            length = request.get_header("Content-length")
+            request.data = _MeteredUpload(request.data, self)
+            if length is not None:
+                request.add_header("Content-length", length)
+        # Covers sending the whole body and waiting for the reply headers
+        with instrumentation.span("speedtest.http_post"):
+            return self._opener.open(request, *args, **kwargs)
 
-def upload():
+    def abort(self):
+        """Shut down the sockets of responses still being read"""
+        for response in list(self._responses):
+            response.abort()
+
+    def __getattr__(self, name):
+        return getattr(self._opener, name)
+
+
+def resolve_source_address(value):
+    """Local IP to bind to, from an IP address or a (Linux) interface name"""
     try:
-        st = speedtest.Speedtest(secure=True)
-        st.get_best_server()
-        time.sleep(1)
-        upload_speed = st.upload() / 1_000_000  # Convert to Mbps
-        return f"Upload speed: {upload_speed:.2f} Mbps"
-    except Exception as e:
-        return f"Upload error: {str(e)}"
\ No newline at end of file
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        pass
+    try:
+        import fcntl
+    except ImportError:
+        raise ValueError(f"{value!r} is not an IP address (interface names need Linux)")
+    SIOCGIFADDR = 0x8915
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            packed = fcntl.ioctl(sock.fileno(), SIOCGIFADDR,
+                                 struct.pack("256s", value.encode()[:15]))
+        except OSError:
+            raise ValueError(f"No IPv4 address found for interface {value!r}")
+    return socket.inet_ntoa(packed[20:24])
+
+
+def probe_servers(client, servers, deadline=PROBE_DEADLINE):
+    """Latency-test servers concurrently, lowest latency first.
+
+    Servers that fail or haven't answered within deadline seconds are left
+    out, so the result can be shorter than servers (or empty).
+    """
+    if not servers:
+        return []
+    pool = ThreadPoolExecutor(max_workers=len(servers))
+    # Copies, get_best_server writes the latency into the dict it is given
+    futures = [pool.submit(client.get_best_server, [dict(server)]) for server in servers]
+    done, _ = wait(futures, timeout=deadline)
+    # Don't wait for stragglers, their sockets time out on their own
+    pool.shutdown(wait=False, cancel_futures=True)
+    ranked = [dict(future.result()) for future in done
+              if future.exception() is None and future.result()["latency"] < _FAILED_LATENCY_MS]
+    ranked.sort(key=lambda server: server["latency"])
+    return ranked
+
+
+class SpeedTestSession:
+    """One speed test: discovery runs once, then ping/download/upload reuse
+    the same configuration and server.
+
+    By default that is one server and the connection count from the
+    speedtest.net config. threads sets the connections per stream and
+    direction, server_count tests that many of the lowest latency servers
+    at once, and source_addresses (IPs or interface names) binds streams
+    to local addresses. With several servers or addresses there is one
+    stream per server / address pair (round robin over the shorter list),
+    all streams transfer at the same time and the totals are the combined
+    bytes over the wall clock time of the phase.
+
+    With a server_cache (server_cache.ServerCache) the latency-ranked
+    servers are reused while they are fresh and the network (public IP,
+    ISP, bind addresses) is unchanged: discovery is then the config fetch
+    plus one parallel latency probe of the cached pick. If that pick got
+    noticeably slower the servers are re-ranked in the background once
+    the test is over, for the next run.
+
+    quick=True ends each transfer phase once a ConvergenceMonitor (built
+    from quick_options) says the rate has settled or a cap was hit. The
+    phase then reports the settled rate with a 95% interval instead of
+    running the full fixed-size schedule.
+
+    Every phase runs on a worker thread and is given phase_timeout
+    seconds. cancel() (from any thread) or the timeout stops the
+    transfers and shuts down open sockets; run() then returns within
+    about ABORT_GRACE seconds with whatever was measured so far and the
+    error set to "Cancelled" / "Timed out ...". Blocking calls the
+    session can't interrupt (connects, the config fetch) still end on
+    their own after `timeout` seconds.
+    """
+
+    PHASES = ("discovery", "download", "upload")
+
+    def __init__(self, secure=True, timeout=10, on_progress=None, sample_interval=0.2,
+                 threads=None, server_count=1, source_addresses=(), server_cache=None,
+                 quick=False, quick_options=None, phase_timeout=60):
+        self.secure = secure
+        self.timeout = timeout
+        self.on_progress = on_progress  # called with ProgressSample, off the GUI thread
+        self.sample_interval = sample_interval
+        self.threads = threads or None
+        self.server_count = max(1, server_count)
+        self.source_addresses = list(source_addresses)
+        self.server_cache = server_cache
+        self._recheck_network = None  # network key to re-rank after the run
+        self.quick = quick
+        self.quick_options = quick_options or {}
+        self.phase_timeout = phase_timeout
+        # speedtest-cli's shutdown_event: set to end the running transfer phase early
+        self._stop_transfer = _StopEvent()
+        self._cancelled = threading.Event()
+        self._meter = None  # the running phase's meter
+        self.client = None  # first stream's client
+        self.clients = []
+        self._openers = []
+        self.result = SpeedTestResult()
+
+    def _timed(self, phase, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            with instrumentation.span(f"speedtest.{phase}"):
+                return func(*args, **kwargs)
+        finally:
+            self.result.timings[phase] = time.perf_counter() - start
+
+    def _new_client(self, source_address):
+        # Deferred so importing this module (e.g. from the GUI) stays cheap
+        import speedtest
+
+        with instrumentation.span("speedtest.config"):
+            client = speedtest.Speedtest(source_address=source_address, secure=self.secure,
+                                         timeout=self.timeout, shutdown_event=self._stop_transfer)
+        # Route transfers through a metered opener for live throughput
+        opener = _MeteredOpener(client._opener)
+        opener.stop = self._stop_transfer
+        client._opener = opener
+        self._openers.append(opener)
+        return client
+
+    def _pick_servers(self, client, network):
+        """The server_count lowest latency servers, best first"""
+        cached = self.server_cache.lookup(network) if self.server_cache is not None else None
+        if cached and len(cached) >= self.server_count:
+            picked = cached[:self.server_count]
+            with instrumentation.span("speedtest.latency_probes"):
+                fresh = probe_servers(client, picked)
+            if len(fresh) == len(picked):
+                was = {server["id"]: server["latency"] for server in picked}
+                if any(server["latency"] > was[server["id"]] * RECHECK_LATENCY_RATIO
+                       + RECHECK_LATENCY_SLACK_MS for server in fresh):
+                    self._recheck_network = network
+                log.info("Using cached server %s (%.1f ms)", fresh[0].get("sponsor"), fresh[0]["latency"])
+                return fresh
+            log.info("A cached server did not answer, picking servers again")
+
+        with instrumentation.span("speedtest.server_list"):
+            client.get_servers()
+        with instrumentation.span("speedtest.latency_probes"):
+            ranked = self._rank_servers(client)
+        if self.server_cache is not None:
+            self.server_cache.store(network, ranked)
+        return ranked[:self.server_count]
+
+    def _rank_servers(self, client):
+        candidates = client.get_closest_servers(limit=max(PROBE_CANDIDATES, self.server_count))
+        ranked = probe_servers(client, candidates)
+        if not ranked:
+            raise RuntimeError("None of the closest servers answered the latency test")
+        return ranked
+
+    def _recheck_servers(self):
+        # Re-rank on the finished test's client so the next run starts from fresh data
+        network, cache, client = self._recheck_network, self.server_cache, self.client
+        if not cache.begin_recheck(network):
+            return
+
+        def recheck():
+            try:
+                client.get_servers()
+                cache.store(network, self._rank_servers(client))
+                log.info("Re-ranked speedtest servers after a latency increase")
+            except Exception as e:
+                log.warning("Could not re-rank speedtest servers: %s", e)
+            finally:
+                cache.end_recheck(network)
+
+        threading.Thread(target=recheck, daemon=True).start()
+
+    def discover(self):
+        """Fetch the config and pick the best server(s) (the only discovery step)"""
+        def _discover():
+            sources = [resolve_source_address(a) for a in self.source_addresses] or [None]
+            first = self._new_client(sources[0])
+            network = network_key(first.config, [source for source in sources if source])
+            servers = self._pick_servers(first, network)
+
+            count = max(len(servers), len(sources))
+            pairs = [(servers[i % len(servers)], sources[i % len(sources)]) for i in range(count)]
+            # Every extra stream needs its own client (each fetches the config)
+            with ThreadPoolExecutor(max_workers=count) as pool:
+                extra = list(pool.map(lambda pair: self._new_client(pair[1]), pairs[1:]))
+            self.clients = [first] + extra
+            self.client = first
+            for client, (server, source) in zip(self.clients, pairs):
+                client._best.clear()
+                client._best.update(server)
+                self.result.streams.append(StreamResult(server=server, source_address=source))
+            return servers[0]
+
+        best = self._timed("discovery", _discover)
+        self.result.server = dict(best)
+        self.result.ping_ms = best["latency"]
+        self.result.quick = self.quick
+        return best
+
+    def _metered(self, phase, func):
+        monitor = ConvergenceMonitor(**self.quick_options) if self.quick else None
+        on_sample = self.on_progress
+        if monitor is not None:
+            def on_sample(sample):
+                if self.on_progress is not None:
+                    self.on_progress(sample)
+                if not self._stop_transfer.is_set() and monitor.add(sample):
+                    self._stop_transfer.set()
+
+        if not self._cancelled.is_set():
+            self._stop_transfer.clear()
+        meter = self._meter = ThroughputMeter(phase, on_sample, self.sample_interval)
+        for opener in self._openers:
+            opener.meter = meter
+        meter.start()
+        try:
+            mbps = self._timed(phase, func, meter)
+        finally:
+            meter.stop()
+            for opener in self._openers:
+                opener.meter = None
+        if monitor is None:
+            return mbps
+        if monitor.reason is not None and not self._cancelled.is_set():
+            # The monitor's stop only ends this phase. Left set it would fail
+            # every later request on these clients, e.g. the server re-rank
+            self._stop_transfer.clear()
+
+        estimate = monitor.estimate()
+        self.result.stop_reasons[phase] = monitor.reason or "complete"
+        if estimate is not None:
+            setattr(self.result, f"{phase}_ci", estimate[1])
+            # The settled rate, the total also counts the ramp-up
+            if monitor.reason == "converged":
+                return estimate[0]
+        return mbps
+
+    def _run_streams(self, method, meter):
+        """Run client.<method> on every stream at once, return total Mbps"""
+        started = time.perf_counter()
+        if len(self.clients) == 1:
+            results = [self._run_stream(self.clients[0], method)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(self.clients)) as pool:
+                results = list(pool.map(lambda client: self._run_stream(client, method),
+                                        self.clients))
+        elapsed = time.perf_counter() - started
+
+        errors = [error for _, error in results if error is not None]
+        if len(errors) == len(results):
+            raise errors[0]
+        for stream, (bits, error) in zip(self.result.streams, results):
+            if error is not None:
+                stream.error = str(error) or type(error).__name__
+            elif method == "download":
+                stream.download_mbps = bits / 1_000_000
+            else:
+                stream.upload_mbps = bits / 1_000_000
+        if len(results) == 1:
+            return results[0][0] / 1_000_000
+        # Streams don't finish together, so add bytes rather than rates
+        return meter.total_bytes * 8 / elapsed / 1_000_000
+
+    def _run_stream(self, client, method):
+        try:
+            return getattr(client, method)(threads=self.threads), None
+        except Exception as e:
+            return None, e
+
+    def download(self):
+        self.result.download_mbps = self._metered(
+            "download", lambda meter: self._run_streams("download", meter))
+        for stream, client in zip(self.result.streams, self.clients):
+            stream.bytes_received = client.results.bytes_received
+        self.result.bytes_received = sum(s.bytes_received for s in self.result.streams)
+        return self.result.download_mbps
+
+    def upload(self):
+        self.result.upload_mbps = self._metered(
+            "upload", lambda meter: self._run_streams("upload", meter))
+        for stream, client in zip(self.result.streams, self.clients):
+            stream.bytes_sent = client.results.bytes_sent
+        self.result.bytes_sent = sum(s.bytes_sent for s in self.result.streams)
+        return self.result.upload_mbps
+
+    def cancel(self):
+        """Stop the test from any thread, run() returns a partial result"""
+        self._cancelled.set()
+        self._abort()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def _abort(self):
+        self._stop_transfer.set()
+        for opener in self._openers:
+            opener.abort()
+        if self._meter is not None:
+            self._meter.stop()  # no more live samples once the phase is over
+
+    def _run_phase(self, phase, step):
+        """Run step on a worker thread, return an error message or None"""
+        if self._cancelled.is_set():
+            return "Cancelled"
+        errors = []
+        done = threading.Event()
+
+        def work():
+            try:
+                step()
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+            finally:
+                done.set()
+
+        threading.Thread(target=work, name=f"speedtest-{phase}", daemon=True).start()
+        deadline = time.monotonic() + self.phase_timeout
+        reason = None
+        while not done.wait(0.05):
+            if self._cancelled.is_set():
+                reason = "Cancelled"
+            elif time.monotonic() >= deadline:
+                reason = f"Timed out after {self.phase_timeout:g} s"
+            if reason is not None:
+                break
+        if reason is None:
+            if errors:
+                return errors[0]
+            # A cancel that the phase noticed first still ends the run here
+            return "Cancelled" if self._cancelled.is_set() else None
+
+        self._abort()
+        if done.wait(ABORT_GRACE):
+            return reason
+        # Still stuck (e.g. in a connect): count what the meter saw and leave it
+        meter = self._meter
+        if meter is not None and meter.phase == phase and meter.total_bytes:
+            if phase == "download":
+                self.result.download_mbps = meter.mbps()
+                self.result.bytes_received = meter.total_bytes
+            else:
+                self.result.upload_mbps = meter.mbps()
+                self.result.bytes_sent = meter.total_bytes
+        log.warning("Speed test %s did not stop within %.1f s, leaving it behind", phase, ABORT_GRACE)
+        # The worker may still write to self.result, give it a copy of its own
+        self.result = copy.deepcopy(self.result)
+        return reason
+
+    def run(self, on_phase=None):
+        """Run every phase in order and return the SpeedTestResult.
+
+        on_phase(name) is called as each phase starts. A failing, cancelled
+        or timed out phase stops the run and is recorded on the result
+        instead of raising; values measured up to then are kept.
+        """
+        steps = {"discovery": self.discover, "download": self.download,
+                 "upload": self.upload}
+        result = self.result
+        for phase in self.PHASES:
+            if on_phase is not None and not self._cancelled.is_set():
+                on_phase(phase)
+            error = self._run_phase(phase, steps[phase])
+            if error is not None:
+                result.error = error
+                result.failed_phase = phase
+                break
+        result.finished_at = time.time()
+        result.cancelled = self._cancelled.is_set()
+        if self._recheck_network is not None and not self._cancelled.is_set():
+            self._recheck_servers()
+        return result
+
+
+def run_speed_test(secure=True, timeout=10, on_phase=None, on_progress=None, **options):
+    """Convenience wrapper: run a full test and return the SpeedTestResult.
+
+    options are the SpeedTestSession ones (threads, server_count,
+    source_addresses, server_cache, quick, quick_options, phase_timeout).
+    """
+    session = SpeedTestSession(secure=secure, timeout=timeout, on_progress=on_progress, **options)
+    return session.run(on_phase=on_phase)
@@ -0,0 +1,89 @@
+import random
+
+import PyQt5.QtCore as QtCore
+
+
+class SpeedTestScheduler(QtCore.QObject):
+    """Runs speed tests every N minutes for unattended link monitoring.
+
+    The scheduler never starts a test itself, it asks through start_test()
+    (which returns False when a test is already running) so scheduled and
+    manual runs share the same SpeedTestThread and can't overlap. The next
+    run is only timed once the current one has reported back.
+    """
+
+    statusChanged = QtCore.pyqtSignal(str)
+
+    def __init__(self, start_test, interval_minutes=30, jitter=0.1,
+                 max_backoff=8, parent=None):
+        super().__init__(parent)
+        self.start_test = start_test
+        self.interval_minutes = interval_minutes
+        self.jitter = jitter              # +/- fraction of the interval
+        self.max_backoff = max_backoff    # cap on the error backoff multiplier
+        self.consecutive_errors = 0
+        self.waiting_for_result = False
+        self.status = "Scheduled tests off"
+        self.statusChanged.connect(self._remember_status)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(QtCore.Qt.VeryCoarseTimer)
+        self._timer.timeout.connect(self._on_due)
+
+    def _remember_status(self, status):
+        # So a settings page built later can show the current state
+        self.status = status
+
+    def isActive(self):
+        return self._timer.isActive() or self.waiting_for_result
+
+    def start(self):
+        self.consecutive_errors = 0
+        self._schedule_next()
+
+    def stop(self):
+        self._timer.stop()
+        self.waiting_for_result = False
+        self.statusChanged.emit("Scheduled tests off")
+
+    def configure(self, interval_minutes, jitter=None):
+        """Apply new settings, rescheduling if the scheduler is running"""
+        self.interval_minutes = interval_minutes
+        if jitter is not None:
+            self.jitter = jitter
+        if self._timer.isActive():
+            self._schedule_next()
+
+    def next_delay(self):
+        """Seconds until the next run, with backoff and random jitter"""
+        backoff = min(2 ** self.consecutive_errors, self.max_backoff)
+        base = self.interval_minutes * 60 * backoff
+        return base * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _schedule_next(self):
+        delay = self.next_delay()
+        self._timer.start(int(delay * 1000))
+        when = QtCore.QDateTime.currentDateTime().addSecs(int(delay))
+        self.statusChanged.emit(f"Next scheduled test at {when.toString('HH:mm:ss')}")
+
+    def _on_due(self):
+        if self.start_test():
+            self.waiting_for_result = True
+            self.statusChanged.emit("Scheduled test running...")
+        else:
+            # Previous (or a manual) test is still going, skip this slot
+            self.statusChanged.emit("Skipped scheduled test, another test is running")
+            self._schedule_next()
+
+    def report_result(self, ok, cancelled=False):
+        """Called when a test finishes, only scheduled runs move the clock.
+
+        A cancelled run says nothing about the link, the backoff stays as it was.
+        """
+        if not self.waiting_for_result:
+            return
+        self.waiting_for_result = False
+        if not cancelled:
+            self.consecutive_errors = 0 if ok else self.consecutive_errors + 1
+        self._schedule_next()
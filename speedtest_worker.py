@@ -0,0 +1,235 @@
+import logging
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+
+import speedtest_logger
+from speedtest_logger import SpeedTestResult
+
+
+log = logging.getLogger(__name__)
+
+# Runs the speed test pipeline in a child process (this file run as a
+# script) so speedtest-cli's transfer threads don't share the GUI's GIL.
+#
+# Messages are pickled tuples over the child's stdin / stdout:
+#   parent -> child: ("run", run_id, options, log_level), ("cancel", run_id)
+#   child -> parent: ("phase", name), ("sample", ProgressSample), ("result", SpeedTestResult)
+
+
+class SpeedTestWorker:
+    """Parent side: one child process kept between runs.
+
+    run() blocks (call it off the GUI thread) and forwards phases and
+    samples to the callbacks as they arrive. If the child dies the run
+    comes back as a failed result and a new child is started straight
+    away for the next run.
+    """
+
+    # A cancelled child that hasn't answered by then gets killed
+    KILL_AFTER = 3.0
+
+    def __init__(self):
+        self._process = None
+        self._run_id = 0
+        self._running = None  # (process, run_id) while run() waits
+        self._cancelled = False
+        self._kill_timer = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Spawn the child now instead of on the first run"""
+        with self._lock:
+            self._ensure_process()
+
+    def _ensure_process(self):
+        if self._process is not None and self._process.poll() is None:
+            return self._process
+        if self._process is not None:
+            log.warning("Speed test worker exited with code %s, restarting it", self._process.returncode)
+        self._process = subprocess.Popen([sys.executable, os.path.abspath(__file__)],
+                                         stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        return self._process
+
+    @staticmethod
+    def _send(process, *message):
+        pickle.dump(message, process.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+        process.stdin.flush()
+
+    def run(self, options, on_phase=None, on_progress=None, cancel_requested=None):
+        """Run one test in the child and return its SpeedTestResult.
+
+        options are SpeedTestSession options. A server_cache is replaced by
+        its path, the child opens the same file. cancel_requested() is
+        checked once the run is under way, for a cancel() that came in
+        before it.
+        """
+        options = dict(options)
+        cache = options.pop("server_cache", None)
+        if cache is not None and cache.path:
+            options["server_cache_path"] = cache.path
+
+        phase = None
+        last_samples = {}  # phase -> latest ProgressSample, for a partial result
+        try:
+            with self._lock:
+                process = self._ensure_process()
+                self._run_id += 1
+                self._running = (process, self._run_id)
+                self._cancelled = False
+                self._send(process, "run", self._run_id, options,
+                           logging.getLogger().getEffectiveLevel())
+            if cancel_requested is not None and cancel_requested():
+                self.cancel()
+
+            while True:
+                kind, payload = pickle.load(process.stdout)
+                if kind == "phase":
+                    phase = payload
+                    if on_phase is not None:
+                        on_phase(payload)
+                elif kind == "sample":
+                    last_samples[payload.phase] = payload
+                    if on_progress is not None:
+                        on_progress(payload)
+                elif kind == "result":
+                    return payload
+        except (EOFError, OSError, pickle.UnpicklingError) as e:
+            return self._lost(e, phase or "discovery", last_samples)
+        finally:
+            with self._lock:
+                self._running = None
+                if self._kill_timer is not None:
+                    self._kill_timer.cancel()
+                    self._kill_timer = None
+
+    def _lost(self, error, phase, last_samples):
+        # The child died (or was killed after a cancel): report what we saw of it
+        process = self._process
+        try:
+            code = process.wait(timeout=1) if process is not None else None
+        except subprocess.TimeoutExpired:
+            process.kill()
+            code = process.wait()
+        result = SpeedTestResult(failed_phase=phase, cancelled=self._cancelled)
+        result.error = "Cancelled" if self._cancelled else f"Speed test worker stopped (exit code {code})"
+        for sample in last_samples.values():
+            mbps = sample.bytes * 8 / sample.elapsed / 1_000_000 if sample.elapsed else None
+            if sample.phase == "download":
+                result.download_mbps, result.bytes_received = mbps, sample.bytes
+            elif sample.phase == "upload":
+                result.upload_mbps, result.bytes_sent = mbps, sample.bytes
+        if not self._cancelled:
+            log.warning("Speed test worker lost during %s: %s", phase, error)
+        result.finished_at = result.started_at
+        if not self._closed:
+            self.start()  # warm again for the next run
+        return result
+
+    def cancel(self):
+        """Ask the running test to stop, kill the child if it doesn't"""
+        with self._lock:
+            if self._running is None:
+                return
+            process, run_id = self._running
+            self._cancelled = True
+            try:
+                self._send(process, "cancel", run_id)
+            except OSError:
+                pass
+            if self._kill_timer is None:
+                self._kill_timer = threading.Timer(self.KILL_AFTER, process.kill)
+                self._kill_timer.daemon = True
+                self._kill_timer.start()
+
+    def close(self, timeout=1.0):
+        """Stop the child (closing its stdin ends it), kill it if it lingers"""
+        with self._lock:
+            self._closed = True
+            process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+################CHILD PROCESS################
+
+def main():
+    # Keep the real stdout for messages; anything printed goes to stderr
+    channel = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    logging.basicConfig(stream=sys.stderr, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    send_lock = threading.Lock()
+
+    def send(kind, payload):
+        with send_lock:
+            pickle.dump((kind, payload), channel, protocol=pickle.HIGHEST_PROTOCOL)
+            channel.flush()
+
+    import server_cache
+    import speedtest  # the slow import, done before the first run request comes in
+
+    runs = queue.Queue()
+    state = {"run_id": None, "session": None, "cancelled": set()}
+    state_lock = threading.Lock()
+
+    def read_commands():
+        try:
+            while True:
+                message = pickle.load(sys.stdin.buffer)
+                if message[0] == "cancel":
+                    with state_lock:
+                        state["cancelled"].add(message[1])
+                        if state["run_id"] == message[1] and state["session"] is not None:
+                            state["session"].cancel()
+                else:
+                    runs.put(message)
+        except (EOFError, OSError, pickle.UnpicklingError):
+            pass
+        # The parent is gone or closed us: stop whatever runs and exit
+        with state_lock:
+            if state["session"] is not None:
+                state["session"].cancel()
+        runs.put(None)
+
+    threading.Thread(target=read_commands, daemon=True).start()
+
+    while True:
+        message = runs.get()
+        if message is None:
+            break
+        _, run_id, options, log_level = message
+        logging.getLogger().setLevel(log_level)
+        path = options.pop("server_cache_path", None)
+        if path:
+            options["server_cache"] = server_cache.ServerCache(path)
+
+        session = speedtest_logger.SpeedTestSession(
+            on_progress=lambda sample: send("sample", sample), **options)
+        with state_lock:
+            state["run_id"], state["session"] = run_id, session
+            if run_id in state["cancelled"]:
+                session.cancel()
+        result = session.run(on_phase=lambda phase: send("phase", phase))
+        with state_lock:
+            state["run_id"], state["session"] = None, None
+            state["cancelled"].discard(run_id)
+        send("result", result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import json
+import time
+
+
+class StartupTimer:
+    """Collects named marks from process start up to the first paint.
+
+    Times are milliseconds since the timer was created, which interface.py
+    does before its own imports.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks[name] = (time.perf_counter() - self.started) * 1000
+
+    def report(self):
+        return {name: round(ms, 1) for name, ms in self.marks.items()}
+
+    def report_json(self):
+        return json.dumps(self.report())
+
+
+def watch_first_paint(app, timer, on_painted=None):
+    """Mark 'first_paint' the first time any widget gets a paint event"""
+    import PyQt5.QtCore as QtCore
+
+    class _FirstPaintFilter(QtCore.QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QtCore.QEvent.Paint:
+                app.removeEventFilter(self)
+                timer.mark("first_paint")
+                if on_painted is not None:
+                    # Let the paint finish before reporting
+                    QtCore.QTimer.singleShot(0, on_painted)
+            return False
+
+    paint_filter = _FirstPaintFilter(app)
+    app.installEventFilter(paint_filter)
+    return paint_filter
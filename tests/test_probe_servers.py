@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import speedtest_logger
+
+
+class FakeClient:
+    """Answers get_best_server like speedtest-cli: sum of 3 probes / 6, 3600 s per failure"""
+
+    def __init__(self, failures):
+        self.failures = failures  # server id -> failed probes out of 3
+
+    def get_best_server(self, servers):
+        server = dict(servers[0])
+        failed = self.failures.get(server["id"], 0)
+        seconds = failed * 3600 + (3 - failed) * 0.02
+        server["latency"] = round(seconds / 6 * 1000, 3)
+        return server
+
+
+def test_partial_probe_failure_is_dropped():
+    servers = [{"id": "1"}, {"id": "2"}, {"id": "3"}]
+    client = FakeClient({"2": 1, "3": 3})
+    ranked = speedtest_logger.probe_servers(client, servers)
+    assert [server["id"] for server in ranked] == ["1"]
+    assert ranked[0]["latency"] == 10.0
+
+
+def test_all_probes_failing_leaves_nothing():
+    client = FakeClient({"1": 1})
+    assert speedtest_logger.probe_servers(client, [{"id": "1"}]) == []
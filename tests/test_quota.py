@@ -0,0 +1,54 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import quota
+
+
+def _wait_in_thread(scheduler, cancel=None):
+    # Start an acquire() that has to wait, return (thread, outcome list)
+    outcome = []
+
+    def wait():
+        try:
+            scheduler.acquire(scheduler.ticket(0), cancel)
+            outcome.append("granted")
+        except quota.QuotaExceeded as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=wait, daemon=True)
+    thread.start()
+    time.sleep(0.1)
+    return thread, outcome
+
+
+def _exhausted():
+    scheduler = quota.QuotaScheduler(per_minute=1, per_day=None, max_wait=60)
+    scheduler.acquire(scheduler.ticket(0))
+    return scheduler
+
+
+def test_cancel_wakes_the_waiter():
+    scheduler = _exhausted()
+    event = threading.Event()
+    thread, outcome = _wait_in_thread(scheduler, event)
+    scheduler.cancel(event)
+    thread.join(1)
+    assert not thread.is_alive()
+    assert isinstance(outcome[0], quota.QuotaCancelled)
+
+
+def test_close_fails_current_and_later_waiters():
+    scheduler = _exhausted()
+    thread, outcome = _wait_in_thread(scheduler)
+    scheduler.close()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert isinstance(outcome[0], quota.QuotaCancelled)
+    with pytest.raises(quota.QuotaCancelled):
+        scheduler.acquire(scheduler.ticket(0))
@@ -0,0 +1,118 @@
+import PyQt5.QtGui as QtGui
+import PyQt5.QtWidgets as QtWidgets
+
+
+# Every colour used by the app, once per theme. The window palette, the
+# speedometer gauges and the history chart are all built from these.
+THEMES = {
+    "dark": {
+        "window": "#1e1e1e",
+        "base": "#252525",       # text boxes, gauge face
+        "text": "#ffffff",
+        "border": "#3a3a3a",     # gauge outline
+        "button": "#2d2d2d",     # spin boxes, combo boxes, check boxes
+        "disabled_text": "#888888",
+        "needle": "#ff0000",
+        "grid": "#333333",       # chart grid lines
+        "download": "#14a085",
+        "upload": "#f0a030",
+        "ping": "#b080e0",
+    },
+    "light": {
+        "window": "#f5f5f5",
+        "base": "#ffffff",
+        "text": "#000000",
+        "border": "#cccccc",
+        "button": "#e0e0e0",
+        "disabled_text": "#666666",
+        "needle": "#ff0000",
+        "grid": "#e4e4e4",
+        "download": "#0d7377",
+        "upload": "#d07800",
+        "ping": "#7040b0",
+    },
+}
+DEFAULT_THEME = "dark"
+
+# Push buttons keep the same accent in both themes
+ACCENT = "#0d7377"
+ACCENT_HOVER = "#14a085"
+ACCENT_PRESSED = "#0a5f63"
+
+# The only stylesheet left, and it doesn't depend on the theme: disabled
+# buttons use translucent grey so they blend with either window colour.
+# It is set on the buttons themselves, never on a window or page, since Qt
+# stops passing palette changes down to widgets under a stylesheet.
+BUTTON_STYLE = f"""
+    QPushButton {{
+        background-color: {ACCENT};
+        color: white;
+        border: none;
+        border-radius: 5px;
+        padding: 10px;
+        font-size: 14px;
+    }}
+    QPushButton:hover {{
+        background-color: {ACCENT_HOVER};
+    }}
+    QPushButton:pressed {{
+        background-color: {ACCENT_PRESSED};
+    }}
+    QPushButton:disabled {{
+        background-color: rgba(128, 128, 128, 40%);
+        color: rgba(128, 128, 128, 90%);
+    }}
+"""
+
+_palettes = {}
+
+
+def theme_name(name):
+    """name if it is a known theme, else the default (e.g. from old settings)"""
+    return name if name in THEMES else DEFAULT_THEME
+
+
+def tokens(name):
+    return THEMES[theme_name(name)]
+
+
+def palette(name):
+    """QPalette for a theme, built on first use and reused after that"""
+    name = theme_name(name)
+    if name not in _palettes:
+        _palettes[name] = _build_palette(THEMES[name])
+    return _palettes[name]
+
+
+def _build_palette(colors):
+    color = {key: QtGui.QColor(value) for key, value in colors.items()}
+    pal = QtGui.QPalette()
+    pal.setColor(QtGui.QPalette.Window, color["window"])
+    pal.setColor(QtGui.QPalette.WindowText, color["text"])
+    pal.setColor(QtGui.QPalette.Base, color["base"])
+    pal.setColor(QtGui.QPalette.AlternateBase, color["window"])
+    pal.setColor(QtGui.QPalette.Text, color["text"])
+    pal.setColor(QtGui.QPalette.Button, color["button"])
+    pal.setColor(QtGui.QPalette.ButtonText, color["text"])
+    pal.setColor(QtGui.QPalette.ToolTipBase, color["base"])
+    pal.setColor(QtGui.QPalette.ToolTipText, color["text"])
+    pal.setColor(QtGui.QPalette.PlaceholderText, color["disabled_text"])
+    pal.setColor(QtGui.QPalette.Highlight, QtGui.QColor(ACCENT))
+    pal.setColor(QtGui.QPalette.HighlightedText, QtGui.QColor("#ffffff"))
+    for role in (QtGui.QPalette.WindowText, QtGui.QPalette.Text, QtGui.QPalette.ButtonText):
+        pal.setColor(QtGui.QPalette.Disabled, role, color["disabled_text"])
+    return pal
+
+
+def style_buttons(widget):
+    """Give every push button under widget the accent button style"""
+    for button in widget.findChildren(QtWidgets.QPushButton):
+        button.setStyleSheet(BUTTON_STYLE)
+
+
+def heading_font(widget, pixel_size):
+    """Bold font of the given size, instead of a per-label stylesheet"""
+    font = widget.font()
+    font.setPixelSize(pixel_size)
+    font.setBold(True)
+    return font
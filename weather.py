@@ -1,44 +1,309 @@
-import requests
+import contextlib
 import os
-from dotenv import load_dotenv
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
-load_dotenv()
+import instrumentation
+import quota
+from quota import QuotaExceeded
 
-API_KEY = os.getenv("api_key")
-BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
+# requests and dotenv are imported on first use, not at import time, so
+# the GUI starts without paying for them
+
+API_KEY = None  # read from the environment / .env on the first request
+_env_loaded = False
+BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+GROUP_URL = "https://api.openweathermap.org/data/2.5/group"
+GROUP_LIMIT = 20  # max city ids per group request
+
+# Network policy, change through configure()
+CONNECT_TIMEOUT = 3.05   # seconds to establish the TCP/TLS connection
+READ_TIMEOUT = 10        # seconds to wait for the server between bytes
+MAX_RETRIES = 3          # retries on connection errors, 429 and 5xx
+BACKOFF_FACTOR = 0.5     # 0.5s, 1s, 2s ... between retries
+MAX_WORKERS = 32         # concurrent requests when refreshing many cities
+POOL_SIZE = MAX_WORKERS  # keep-alive connections kept per host
+
+_session = None
+_session_lock = threading.Lock()
+
+# Every request waits for the free-tier budget, change through configure_quota()
+PER_MINUTE = 60
+PER_DAY = 1000
+QUOTA = quota.QuotaScheduler(PER_MINUTE, PER_DAY, name="Weather API")
+
+# Lower goes first: what the user just asked for beats background refreshes
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+_priority = threading.local()
+_cancel = threading.local()  # .event: set to give up waiting for quota (iter_many)
+
+# Identical requests already on their way, later callers share the reply
+_in_flight = {}  # (url, params) -> (Future, quota.Ticket)
+_in_flight_lock = threading.Lock()
+coalesced = 0
+
+
+def get_api_key():
+    """API key from the 'api_key' env var or .env file, loaded once"""
+    global API_KEY, _env_loaded
+    if API_KEY is None and not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        API_KEY = os.getenv("api_key")
+        _env_loaded = True
+    return API_KEY
+
+
+def _build_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # Only connection errors are retried here: a retried status would be
+    # sent again without going through QUOTA (429 and 5xx retries are in
+    # _request_json)
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(),
+        allowed_methods=("GET",),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Long-lived pooled session so repeat lookups skip the TCP/TLS handshake"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+def configure(connect_timeout=None, read_timeout=None, retries=None, backoff_factor=None):
+    """Change timeouts/retry policy, the pooled session is rebuilt on next use"""
+    global CONNECT_TIMEOUT, READ_TIMEOUT, MAX_RETRIES, BACKOFF_FACTOR, _session
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+    if retries is not None:
+        MAX_RETRIES = retries
+    if backoff_factor is not None:
+        BACKOFF_FACTOR = backoff_factor
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def configure_quota(per_minute=None, per_day=None):
+    """Request budget (None for no limit), used budget carries over"""
+    global PER_MINUTE, PER_DAY
+    PER_MINUTE, PER_DAY = per_minute, per_day
+    QUOTA.configure(per_minute, per_day)
+
+
+@contextlib.contextmanager
+def priority(level):
+    """with weather.priority(weather.PRIORITY_INTERACTIVE): ... for this thread's requests"""
+    previous = getattr(_priority, "level", PRIORITY_BACKGROUND)
+    _priority.level = level
+    try:
+        yield
+    finally:
+        _priority.level = previous
+
+
+def _get_json(url, params):
+    """GET an OpenWeather endpoint, sharing identical in-flight requests"""
+    global coalesced
+    level = getattr(_priority, "level", PRIORITY_BACKGROUND)
+    key = (url, tuple(sorted((name, str(value)) for name, value in params.items())))
+    with _in_flight_lock:
+        entry = _in_flight.get(key)
+        if entry is None:
+            entry = _in_flight[key] = (Future(), QUOTA.ticket(level))
+            owner = True
+        else:
+            coalesced += 1
+            owner = False
+    future, ticket = entry
+    if not owner:
+        # Don't wait behind a background refresh's place in the queue
+        QUOTA.raise_priority(ticket, level)
+        return future.result()
+
+    try:
+        result = _request_json(url, params, ticket)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _in_flight_lock:
+            del _in_flight[key]
+
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _request_json(url, params, ticket):
+    """GET an OpenWeather endpoint with proper query encoding and timeouts.
+
+    429 and server errors are retried with backoff, every attempt waits
+    for its own QUOTA token. A 429 empties this minute's budget first, so
+    its retry waits for quota rather than going straight back out.
+    """
+    import requests
+
+    params = dict(params, appid=get_api_key())
+    cancel = getattr(_cancel, "event", None)
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            time.sleep(BACKOFF_FACTOR * 2 ** (attempt - 1))
+            ticket = QUOTA.ticket(ticket.priority)
+        with instrumentation.span("weather.quota_wait"):
+            QUOTA.acquire(ticket, cancel)
+        # Includes connection retries and their backoff
+        with instrumentation.span("weather.request"):
+            response = get_session().get(url, params=params,
+                                         timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        if response.status_code == requests.codes.too_many_requests:
+            QUOTA.drain()  # our limits are more generous than the key's
+        if response.status_code not in RETRY_STATUSES:
+            break
+    response.raise_for_status()
+    with instrumentation.span("weather.decode"):
+        return response.json()
+
+
+def location_params(location):
+    """Query parameters for a free-text city or a gazetteer.City.
+
+    A City is looked up by its OpenWeather id (or coordinates) so the API
+    can't pick a different place with the same name.
+    """
+    city_id = getattr(location, "city_id", None)
+    if city_id:
+        return {"id": city_id}
+    if hasattr(location, "lat") and hasattr(location, "lon"):
+        return {"lat": location.lat, "lon": location.lon}
+    return {"q": location}
+
+
+def get_current_weather(location, units="metric"):
+    import requests
 
-def get_current_weather(location):
     try:
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={location}&appid={API_KEY}&units=metric"
-        respone = requests.get(url)
-        respone.raise_for_status()
-        data = respone.json()
-
-        weather_info ={
-            "location": data["name"],
-            "temperature": data["main"]["temp"],
-            "description": data["weather"][0]["description"],
-            "humidity": data["main"]["humidity"],
-            "wind_speed": data["wind"]["speed"]
-        }
-        return weather_info
-    except requests.exceptions.RequestException as e:
+        data = _get_json(BASE_URL, dict(location_params(location), units=units))
+        return _weather_info(data)
+    except (requests.exceptions.RequestException, QuotaExceeded) as e:
         return{"error": f"Error fetching weather data: {e}"}
-    
-def get_forecast(location, days=7):
+
+
+def _weather_info(data):
+    weather_info ={
+        "location": data["name"],
+        "temperature": data["main"]["temp"],
+        "description": data["weather"][0]["description"],
+        "humidity": data["main"]["humidity"],
+        "wind_speed": data["wind"]["speed"]
+    }
+    return weather_info
+
+
+def get_group_weather(city_ids, units="metric"):
+    """Current weather for up to GROUP_LIMIT city ids in one request.
+
+    Returns {city_id: weather_info}, ids missing from the reply map to an
+    error dict.
+    """
+    import requests
+
+    try:
+        data = _get_json(GROUP_URL, {"id": ",".join(str(i) for i in city_ids), "units": units})
+        found = {item["id"]: _weather_info(item) for item in data.get("list", [])}
+    except (requests.exceptions.RequestException, QuotaExceeded) as e:
+        found = {}
+        missing = {"error": f"Error fetching weather data: {e}"}
+    else:
+        missing = {"error": "City not returned by the group request"}
+    return {city_id: found.get(city_id, missing) for city_id in city_ids}
+
+
+def _cancellable(event, fn, *args):
+    # Runs on an iter_many pool thread, its requests stop waiting for quota once event is set
+    _cancel.event = event
     try:
-        url = f"{BASE_URL}?q={location}&appid={API_KEY}&units=metric"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        forecast_info = {
-            "location": data["name"],
-            "temperature": data["main"]["temp"],
-            "description": data["weather"][0]["description"],
-            "humidity": data["main"]["humidity"],
-            "wind_speed": data["wind"]["speed"]
-        }
-        return forecast_info
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Error fetching forecast data: {e}"}
\ No newline at end of file
+        return fn(*args)
+    finally:
+        _cancel.event = None
+
+
+def iter_many(locations, units="metric", max_workers=MAX_WORKERS):
+    """Fetch weather for many locations at once, yielding (index, data) as
+    each result arrives.
+
+    Gazetteer cities with an id are fetched GROUP_LIMIT at a time through
+    the group endpoint, everything else goes through a bounded thread pool,
+    so the total time is roughly that of the slowest single request.
+    """
+    by_id = {}
+    singles = []
+    for index, location in enumerate(locations):
+        city_id = getattr(location, "city_id", None)
+        if city_id:
+            by_id.setdefault(city_id, []).append(index)
+        else:
+            singles.append(index)
+
+    # Not a with block: its exit waits for every queued request, so a
+    # consumer that stops early would still block until all were sent.
+    # Requests already waiting for quota are woken through stop
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    stop = threading.Event()
+    try:
+        futures = {}
+        ids = list(by_id)
+        for start in range(0, len(ids), GROUP_LIMIT):
+            batch = ids[start:start + GROUP_LIMIT]
+            futures[pool.submit(_cancellable, stop, get_group_weather, batch, units)] = None
+        for index in singles:
+            futures[pool.submit(_cancellable, stop, get_current_weather,
+                                locations[index], units)] = index
+
+        for future in as_completed(futures):
+            index = futures[future]
+            if index is not None:
+                yield index, future.result()
+                continue
+            for city_id, info in future.result().items():
+                for same_city_index in by_id[city_id]:
+                    yield same_city_index, info
+    finally:
+        QUOTA.cancel(stop)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def get_forecast(location, days=7, units="metric"):
+    """Daily forecast rollups from the 5-day / 3-hour endpoint.
+
+    The API only covers 5-6 days ahead, so `days` is capped by what comes back.
+    """
+    # numpy is only needed once someone asks for a forecast
+    import forecast
+
+    series = forecast.get_forecast_series(location, units)
+    if isinstance(series, dict):
+        return series
+    return {"location": series.location, "daily": series.daily_rows(days)}
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import weather
+
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".morti_gui", "weather_cache.json")
+
+
+def normalize_location(location):
+    """'  new   York ' and 'New York' should share one cache entry"""
+    city_id = getattr(location, "city_id", None)
+    if city_id:
+        return f"id:{city_id}"
+    return " ".join(str(location).split()).casefold()
+
+
+class WeatherCache:
+    """TTL + LRU cache in front of weather.get_current_weather (or any fetch
+    function with the same signature, e.g. forecast.get_forecast_series).
+
+    Entries younger than ttl are served as-is. Older entries (up to
+    max_stale) are still returned straight away but flagged stale so the
+    caller can show them while a refresh runs in the background. Errors
+    are never cached. If path is set the cache is kept on disk as JSON so
+    it stays warm across restarts.
+    """
+
+    def __init__(self, fetch=weather.get_current_weather, ttl=600, max_stale=6 * 3600,
+                 max_entries=256, path=None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.path = path
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+        self._entries = OrderedDict()  # key -> (stored_at, data), oldest first
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path:
+            self._load()
+
+    def _key(self, location, units):
+        return f"{normalize_location(location)}|{units}"
+
+    def lookup(self, location, units="metric"):
+        """Return (data, state) with state 'fresh', 'stale' or 'miss'"""
+        key = self._key(location, units)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, data = entry
+                age = now - stored_at
+                if age <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return data, "fresh"
+                if age <= self.ttl + self.max_stale:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    return data, "stale"
+                del self._entries[key]
+            self.misses += 1
+            return None, "miss"
+
+    def refresh(self, location, units="metric"):
+        """Fetch from the API and store the result (unless it's an error)"""
+        data = self.fetch(location, units=units)
+        with self._lock:
+            self.refreshes += 1
+        if not (isinstance(data, dict) and "error" in data):
+            self.put(location, data, units)
+        return data
+
+    def get(self, location, units="metric", on_refresh=None):
+        """Cached lookup that revalidates stale entries on a background thread.
+
+        on_refresh(data) is called from that thread once fresh data is in.
+        """
+        data, state = self.lookup(location, units)
+        if state == "fresh":
+            return data
+        if state == "miss":
+            return self.refresh(location, units)
+
+        key = self._key(location, units)
+        with self._lock:
+            already_running = key in self._refreshing
+            self._refreshing.add(key)
+        if not already_running:
+            threading.Thread(target=self._revalidate, args=(key, location, units, on_refresh),
+                             daemon=True).start()
+        return data
+
+    def _revalidate(self, key, location, units, on_refresh):
+        try:
+            data = self.refresh(location, units)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+        if on_refresh is not None:
+            on_refresh(data)
+
+    def put(self, location, data, units="metric", stored_at=None):
+        key = self._key(location, units)
+        with self._lock:
+            self._entries[key] = (stored_at or time.time(), data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            snapshot = list(self._entries.items()) if self.path else None
+        if snapshot is not None:
+            self._save(snapshot)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            self._save([])
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {"size": size, "hits": self.hits, "stale_hits": self.stale_hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "refreshes": self.refreshes}
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, stored_at, data in items[-self.max_entries:]:
+            self._entries[key] = (stored_at, data)
+
+    def _save(self, items):
+        # Write to a temp file and swap it in so a crash can't corrupt the cache
+        try:
+            with self._save_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump([[key, stored_at, data] for key, (stored_at, data) in items], f)
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.warning("Could not save weather cache: %s", e)
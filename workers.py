@@ -0,0 +1,128 @@
+import threading
+import time
+
+import PyQt5.QtCore as QtCore
+
+import instrumentation
+
+
+class _JobSignals(QtCore.QObject):
+    # Lives on the GUI thread, so emits from the worker arrive queued
+    progress = QtCore.pyqtSignal(object)
+    done = QtCore.pyqtSignal(object, object)  # result, exception
+
+
+class Job(QtCore.QRunnable):
+    """One unit of work for the WorkerPool.
+
+    The function is called as fn(job, *args, **kwargs). It can call
+    job.report(value) to send intermediate results and should check
+    job.cancelled now and then if it runs for a long time.
+    """
+
+    def __init__(self, key, fn, args, kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = _JobSignals()
+        self.result_callbacks = []
+        self.progress_callbacks = []
+        self._cancelled = threading.Event()
+        self.submitted_at = time.perf_counter()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def report(self, value):
+        self.signals.progress.emit(value)
+
+    def run(self):
+        if instrumentation.ENABLED:
+            instrumentation.record("jobs.queue_wait", (time.perf_counter() - self.submitted_at) * 1000)
+        try:
+            with instrumentation.span(f"jobs.{self.fn.__name__}"):
+                result = self.fn(self, *self.args, **self.kwargs)
+        except Exception as e:
+            result, error = None, e
+        else:
+            error = None
+        try:
+            self.signals.done.emit(result, error)
+        except RuntimeError:
+            # The app is being torn down and the signal object is gone
+            pass
+
+
+class WorkerPool(QtCore.QObject):
+    """Shared QThreadPool for background work started from the GUI.
+
+    Caps the number of worker threads, merges identical in-flight requests
+    (same key) into a single job, and calls every callback on the GUI
+    thread. shutdown() drops queued jobs and waits for running ones so
+    nothing is left behind when the window closes.
+    """
+
+    def __init__(self, max_threads=4, parent=None):
+        super().__init__(parent)
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(max_threads)
+        self._inflight = {}  # key -> Job
+        self._closed = False
+
+    def submit(self, key, fn, *args, on_result=None, on_progress=None, **kwargs):
+        """Run fn on the pool, or join the identical job already running.
+
+        on_result(result, error) gets the return value (error is None) or
+        the exception raised. Returns the Job.
+        """
+        if self._closed:
+            return None
+        job = self._inflight.get(key)
+        if job is None:
+            job = Job(key, fn, args, kwargs)
+            job.signals.progress.connect(lambda value, job=job: self._on_progress(job, value))
+            job.signals.done.connect(lambda result, error, job=job: self._on_done(job, result, error))
+            self._inflight[key] = job
+            self._pool.start(job)
+        if on_result is not None:
+            job.result_callbacks.append(on_result)
+        if on_progress is not None:
+            job.progress_callbacks.append(on_progress)
+        return job
+
+    def isRunning(self, key):
+        return key in self._inflight
+
+    def activeCount(self):
+        return len(self._inflight)
+
+    def _on_progress(self, job, value):
+        if self._closed:
+            return
+        for callback in list(job.progress_callbacks):
+            callback(value)
+
+    def _on_done(self, job, result, error):
+        if self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        if self._closed:
+            return
+        for callback in job.result_callbacks:
+            callback(result, error)
+
+    def shutdown(self, timeout_ms=3000):
+        """Cancel queued work and wait (bounded) for running jobs to return"""
+        self._closed = True
+        self._pool.clear()
+        for job in self._inflight.values():
+            job.cancel()
+        finished = self._pool.waitForDone(timeout_ms)
+        self._inflight.clear()
+        return finished